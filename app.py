@@ -1,24 +1,37 @@
 import os
-from flask import Flask, render_template, request , url_for
+from flask import Flask, render_template, request , url_for, jsonify, Response, stream_template, stream_with_context
 from models import db
-import matplotlib.pyplot as plt
+from chart_cache import ChartCache
+from instrumentation import Metrics
+from profiler import QueryProfiler
+from catalog import CatalogCache
+from render_pool import RenderPool, RenderBusy, RenderTimeout
+from columnar_store import ColumnarStore, METRIC_COLUMNS
+import snapshot
 import pandas as pd
 import io
+import csv
+import json
 import base64
 import calendar
-import matplotlib
-from sqlalchemy import text, inspect as sql_inspect
+from sqlalchemy import text
 from functools import lru_cache
 import re
 
-matplotlib.use('Agg')
-
 # --- Database Configuration ---
 user = "root"
 password = "2102005"
 port = 3306
 host = "localhost"
-new_db_name = "rbi_metric_neft"
+# Payment system this process serves (NEFT, RTGS, ...): fileconverter.py loads each
+# into its own database with the same tables, named after it. The metric is fixed
+# for the process (database, table names, backend and catalog are set up at import),
+# so serve each metric from its own process, e.g. METRIC=RTGS on another port behind
+# the same proxy. The chart cache, /metrics series and slow query log are namespaced
+# by metric and the default snapshot dir is per metric, so they can share one instance dir.
+METRIC_NAME = os.environ.get('METRIC', 'NEFT').upper()
+TABLE_PREFIX = METRIC_NAME.lower()
+new_db_name = f"rbi_metric_{TABLE_PREFIX}"
 
 # --- Flask App Initialization ---
 app = Flask(__name__)
@@ -29,8 +42,58 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
     f"mysql+pymysql://{user}:{password}@{host}/{new_db_name}"
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Query backend: 'sql' (MySQL, default) or 'memory' (NumPy columnar store)
+app.config['NEFT_BACKEND'] = os.environ.get('NEFT_BACKEND', 'sql')
+app.config['NEFT_SNAPSHOT_DIR'] = os.environ.get('NEFT_SNAPSHOT_DIR', os.path.join(os.getcwd(), "RBI_Data", "snapshot", TABLE_PREFIX))
+app.config['TRANSACTIONS_PAGE_SIZE'] = int(os.environ.get('TRANSACTIONS_PAGE_SIZE', 100))
+app.config['TRANSACTIONS_MAX_PAGE_SIZE'] = int(os.environ.get('TRANSACTIONS_MAX_PAGE_SIZE', 1000))
+app.config['CHART_CACHE_DIR'] = os.environ.get('CHART_CACHE_DIR', os.path.join(instance_path, 'chart_cache'))
+app.config['CHART_CACHE_MAX_ENTRIES'] = int(os.environ.get('CHART_CACHE_MAX_ENTRIES', 64))
+app.config['CHART_CACHE_MAX_DISK_ENTRIES'] = int(os.environ.get('CHART_CACHE_MAX_DISK_ENTRIES', 512))
+# Chart render pool: worker processes (0 = render in the request thread), admitted jobs, seconds per job,
+# and seconds past the timeout before a still-running job's workers are taken as hung and replaced
+app.config['RENDER_WORKERS'] = int(os.environ.get('RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['RENDER_MAX_PENDING'] = int(os.environ.get('RENDER_MAX_PENDING', 4 * app.config['RENDER_WORKERS'] or 1))
+app.config['RENDER_TIMEOUT'] = float(os.environ.get('RENDER_TIMEOUT', 30))
+app.config['RENDER_HUNG_GRACE'] = float(os.environ.get('RENDER_HUNG_GRACE', 30))
+# Seconds between polls of the data version written by fileconverter.py
+app.config['CATALOG_TTL_SECONDS'] = float(os.environ.get('CATALOG_TTL_SECONDS', 10))
+# Statements slower than this get an EXPLAIN capture in the slow query log
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+app.config['SLOW_QUERY_LOG_SIZE'] = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+# Token for the /admin routes; without one they only answer local requests
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
 db.init_app(app)
 
+# --- Rendered chart cache (PNG bytes, invalidated by the data version) ---
+chart_cache = ChartCache(
+    app.config['CHART_CACHE_DIR'],
+    max_entries=app.config['CHART_CACHE_MAX_ENTRIES'],
+    max_disk_entries=app.config['CHART_CACHE_MAX_DISK_ENTRIES'],
+    namespace=TABLE_PREFIX,
+)
+
+# --- Chart render pool (matplotlib runs in worker processes, off the request threads) ---
+render_pool = RenderPool(
+    workers=app.config['RENDER_WORKERS'],
+    max_pending=app.config['RENDER_MAX_PENDING'],
+    timeout=app.config['RENDER_TIMEOUT'],
+    hung_grace=app.config['RENDER_HUNG_GRACE'],
+)
+
+# --- Per-request phase timing (Server-Timing header, /metrics) ---
+metrics = Metrics(prefix=TABLE_PREFIX)
+metrics.install(app, lambda: db.engine)
+
+# --- Slow query log (fingerprint, duration, rows, EXPLAIN), shown at /admin/slow-queries ---
+query_profiler = QueryProfiler(
+    threshold_ms=app.config['SLOW_QUERY_MS'],
+    max_entries=app.config['SLOW_QUERY_LOG_SIZE'],
+    namespace=TABLE_PREFIX,
+)
+with app.app_context():
+    query_profiler.install(db.engine)
+
 # --- Utility Functions ---
 def get_month_name(month_num):
     try:
@@ -41,14 +104,12 @@ def get_month_name(month_num):
 
 app.jinja_env.filters['month_name'] = get_month_name
 
-def plot_to_img(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)
-    return img_base64
+# Image formats served by the chart endpoints (?format=...)
+IMAGE_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+def render_chart(spec):
+    """Image bytes for a plot spec (see render_pool.render_spec), drawn in the render pool."""
+    return render_pool.render(spec)
 
 # --- Month name to number mapping ---
 MONTH_MAP = {name.lower(): num for num, name in enumerate(calendar.month_name) if num}
@@ -65,36 +126,125 @@ COL_IN_AMOUNT = "`Amount(Inward)`"
 COL_YEAR = "`Year`"
 COL_MONTH = "`Month`"
 
-# --- Helper function to get and cache NEFT table names ---
-@lru_cache(maxsize=1)
+# Consolidated fact table written by fileconverter.py (one row per bank per month, keyed by bank_id)
+FACT_TABLE = f"{TABLE_PREFIX}_fact"
+# Rollup tables written by fileconverter.py; same column names as the fact table, plus Bank Name
+ROLLUP_MONTHLY = f"{TABLE_PREFIX}_rollup_monthly"            # one row per (Year, Month)
+ROLLUP_BANK = f"{TABLE_PREFIX}_rollup_bank"                  # one row per bank_id
+ROLLUP_BANK_MONTHLY = f"{TABLE_PREFIX}_rollup_bank_monthly"  # one row per (bank_id, Year, Month)
+# Prefix-sum tables written by fileconverter.py: running totals per period (Year * 12 + Month - 1)
+CUMULATIVE_MONTHLY = f"{TABLE_PREFIX}_cumulative_monthly"            # one row per period
+CUMULATIVE_BANK_MONTHLY = f"{TABLE_PREFIX}_cumulative_bank_monthly"  # one row per (bank_id, period)
+# Dimension tables written by fileconverter.py for the filter dropdowns
+DIM_BANK = f"{TABLE_PREFIX}_dim_bank"      # bank_id -> Bank Name
+DIM_PERIOD = f"{TABLE_PREFIX}_dim_period"  # distinct (Year, Month)
+# Ingest manifest written by fileconverter.py (identifies the columnar snapshot's source)
+MANIFEST_TABLE = f"{TABLE_PREFIX}_ingest_manifest"
+VERSION_TABLE = f"{TABLE_PREFIX}_data_version"
+
+# --- Table catalog and data version (polled, reloaded when fileconverter.py bumps the version) ---
+catalog = CatalogCache(lambda: db.engine, ttl=app.config['CATALOG_TTL_SECONDS'], version_table=VERSION_TABLE)
+
+def get_all_table_names():
+    """
+    Returns every table name in the database as a frozenset (cached until the
+    data version changes), so the per-month tables and the fact table share one inspection.
+    """
+    # Need app context to access db.engine if called outside a request
+    with app.app_context():
+        return catalog.table_names()
+
 def get_neft_tables_info():
     """
-    Gets the list of table names matching neft_month_year pattern
+    Gets the list of table names matching the <metric>_month_year pattern
     and extracts year/month. Returns list of dicts.
     """
-    neft_tables_info = []
-    table_pattern = re.compile(r"neft_([a-zA-Z]+)_(\d{4})")
+    table_pattern = re.compile(rf"{TABLE_PREFIX}_([a-zA-Z]+)_(\d{{4}})", re.IGNORECASE)
+    valid_tables = []
+    for tbl in get_all_table_names():
+        match = table_pattern.match(tbl)
+        if match:
+            month_str, year_str = match.groups()
+            month_num = MONTH_MAP.get(month_str.lower())
+            if month_num:
+                valid_tables.append({'name': tbl, 'year': int(year_str), 'month': month_num})
+    # Sort chronologically primarily for predictable UNION order
+    neft_tables_info = sorted(valid_tables, key=lambda x: (x['year'], x['month']))
+    return neft_tables_info
+
+def has_fact_table():
+    return FACT_TABLE in get_all_table_names()
+
+@lru_cache(maxsize=1)
+def warn_no_tables(data_version):
+    """Prints the missing-data warning once per data version rather than on every request."""
+    print(f"WARNING: No {FACT_TABLE} table and no {METRIC_NAME} tables matching pattern '{TABLE_PREFIX}_month_year'.")
+
+def get_data_version():
+    """
+    Data version written by fileconverter.py on every ingest (or a fingerprint
+    of the table catalog for older databases). Use it as the invalidation key of
+    anything derived from the data.
+    """
+    with app.app_context():
+        return catalog.version()
+
+def normalize_filters(bank_name="All Banks", year="All Years", month="All Months"):
+    """Returns only the applied filters, with year/month as ints, for use in cache keys."""
+    filters = {}
+    if bank_name and bank_name != "All Banks":
+        filters['bank_name'] = bank_name.strip()
+    for name, value, default in (('year', year, "All Years"), ('month', month, "All Months")):
+        if value and value != default:
+            try:
+                filters[name] = int(value)
+            except ValueError:
+                pass
+    return filters
+
+class ChartError(Exception):
+    """Raised by the render_graph* functions with the message and status to return."""
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def chart_key(route_name, params):
+    return ChartCache.make_key(route_name, params, get_data_version())
+
+def serve_chart_image(route_name, params, render):
+    """
+    Responds with the chart image for route_name/params in the ?format= requested,
+    with an ETag tied to the data version so browsers can revalidate cheaply.
+    """
+    fmt = request.args.get('format', 'png').lower()
+    if fmt not in IMAGE_MIMETYPES: return f"Unsupported image format: {fmt}", 400
+    params = dict(params, format=fmt)
+    key = chart_key(route_name, params)
+    if key in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{key}"'})
+    def render_timed():
+        # Plot time is the render call minus the SQL and pandas work it does
+        with metrics.timed('plot', exclusive=True):
+            return render(fmt)
     try:
-        # Need app context to access db.engine if called outside a request
-        with app.app_context():
-             inspector = sql_inspect(db.engine)
-             all_tables = inspector.get_table_names()
-             valid_tables = []
-             for tbl in all_tables:
-                 match = table_pattern.match(tbl)
-                 if match:
-                     month_str, year_str = match.groups()
-                     month_num = MONTH_MAP.get(month_str.lower())
-                     if month_num:
-                          valid_tables.append({'name': tbl, 'year': int(year_str), 'month': month_num})
-             # Sort chronologically primarily for predictable UNION order
-             neft_tables_info = sorted(valid_tables, key=lambda x: (x['year'], x['month']))
-             print(f"Found and validated NEFT tables: {[t['name'] for t in neft_tables_info]}")
+        image = chart_cache.get_or_render(key, render_timed)
+    except ChartError as e:
+        return e.message, e.status
+    except RenderBusy as e:
+        return str(e), 503, {'Retry-After': '2'}
+    except RenderTimeout as e:
+        print(f"Timed out generating {route_name} image: {e}")
+        return str(e), 504
     except Exception as e:
-        print(f"Error inspecting database for NEFT tables: {e}")
-    if not neft_tables_info:
-        print("WARNING: No NEFT tables found matching pattern 'neft_month_year'.")
-    return neft_tables_info
+        print(f"Error generating {route_name} image: {e}")
+        return "Error generating graph.", 500
+    if image is None: return "No data for the selected filters.", 404
+    response = Response(image, mimetype=IMAGE_MIMETYPES[fmt])
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
 
 # --- Helper to build the full UNION ALL subquery string ---
 def build_union_all_subquery(tables_info=None):
@@ -136,37 +286,347 @@ def build_union_all_subquery(tables_info=None):
     # Return the combined string for use in a subquery
     return " UNION ALL ".join(selects)
 
+# --- Helper to pick the data source for the FROM clause ---
+def build_source_sql(tables_info=None):
+    """
+    Returns the FROM-clause source aliased as combined_data: the indexed
+    fact table when it exists, otherwise the legacy per-month UNION ALL.
+    """
+    if has_fact_table():
+        # The fact table stores bank_id; the join gives back the Bank Name column the queries use
+        metric_cols = ", ".join(f"f.{col}" for col in (COL_OUT_COUNT, COL_OUT_AMOUNT, COL_IN_COUNT, COL_IN_AMOUNT))
+        return (
+            f"(SELECT b.{COL_BANK_NAME}, {metric_cols}, f.{COL_YEAR}, f.{COL_MONTH} "
+            f"FROM `{FACT_TABLE}` AS f JOIN `{DIM_BANK}` AS b ON b.`bank_id` = f.`bank_id`) AS combined_data"
+        )
+    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
+    if not union_subquery_sql:
+        return None
+    return f"({union_subquery_sql}) AS combined_data"
+
+def build_rollup_source_sql(rollup_table, tables_info=None):
+    """
+    Returns the rollup table as the FROM-clause source when it exists,
+    otherwise falls back to build_source_sql() over the raw rows.
+    """
+    if rollup_table in get_all_table_names():
+        return f"`{rollup_table}` AS combined_data"
+    return build_source_sql(tables_info=tables_info)
+
+# --- Filter dimensions (distinct banks and periods), cached per data version ---
+@lru_cache(maxsize=1)
+def load_filter_dimensions(data_version):
+    """
+    Returns (banks, periods) where periods are (year, month) tuples. Reads the
+    dimension tables when present, otherwise makes a single DISTINCT pass over
+    the source. Keyed on data_version so a catalog change reloads it.
+    """
+    names = get_all_table_names()
+    with db.engine.connect() as connection:
+        if DIM_BANK in names and DIM_PERIOD in names:
+            banks = connection.execute(text(f"SELECT {COL_BANK_NAME} FROM `{DIM_BANK}` ORDER BY {COL_BANK_NAME}")).scalars().all()
+            periods = connection.execute(text(f"SELECT {COL_YEAR}, {COL_MONTH} FROM `{DIM_PERIOD}`")).all()
+        else:
+            source_sql = build_rollup_source_sql(ROLLUP_BANK_MONTHLY)
+            if not source_sql: return (), ()
+            rows = connection.execute(text(f"SELECT DISTINCT {COL_BANK_NAME}, {COL_YEAR}, {COL_MONTH} FROM {source_sql}")).all()
+            banks = sorted({row[0] for row in rows if row[0] is not None})
+            periods = [(row[1], row[2]) for row in rows]
+    periods = sorted({(int(y), int(m)) for y, m in periods if y is not None and m is not None})
+    return tuple(banks), tuple(periods)
+
+# --- Transactions query (keyset pagination on Year DESC, Month DESC, Bank Name ASC) ---
+def encode_cursor(row):
+    """Opaque ?cursor= token pointing just past the given display row."""
+    payload = json.dumps([int(row['year']), int(row['month']), row['bank_name']])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    try:
+        year, month, bank_name = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return {'cursor_year': int(year), 'cursor_month': int(month), 'cursor_bank': str(bank_name)}
+    except (ValueError, TypeError):
+        return None
+
+def build_transactions_query(source_sql, filters, cursor=None, limit=None):
+    """
+    Builds the ordered transactions SELECT for the normalized filters. When a decoded
+    cursor is given only rows after it are returned (keyset pagination), so a page
+    never reads and discards the rows of earlier pages the way OFFSET does.
+
+    SqlBackend pages from the per-bank monthly rollup, which holds the fact rows
+    with Bank Name and is indexed (Year DESC, Month DESC, Bank Name): a page is a
+    range scan of that index that stops after LIMIT rows, with no join or sort.
+    """
+    params = dict(filters)
+    where_clauses = []
+    # Build WHERE clause using correct column constants (they refer to columns in combined_data)
+    if 'bank_name' in filters: where_clauses.append(f"{COL_BANK_NAME} = :bank_name")
+    if 'year' in filters: where_clauses.append(f"{COL_YEAR} = :year")
+    if 'month' in filters: where_clauses.append(f"{COL_MONTH} = :month")
+    if cursor:
+        where_clauses.append(
+            f"({COL_YEAR} < :cursor_year OR ({COL_YEAR} = :cursor_year AND "
+            f"({COL_MONTH} < :cursor_month OR ({COL_MONTH} = :cursor_month AND {COL_BANK_NAME} > :cursor_bank))))"
+        )
+        params.update(cursor)
+
+    sql_query = f"""
+        SELECT {COL_BANK_NAME}, {COL_YEAR}, {COL_MONTH},
+               {COL_IN_COUNT}, {COL_OUT_COUNT},
+               {COL_IN_AMOUNT}, {COL_OUT_AMOUNT}
+        FROM {source_sql}
+    """
+    if where_clauses:
+        sql_query += " WHERE " + " AND ".join(where_clauses)
+    sql_query += f" ORDER BY {COL_YEAR} DESC, {COL_MONTH} DESC, {COL_BANK_NAME} ASC"
+    if limit is not None:
+        sql_query += " LIMIT :limit"
+        params['limit'] = limit
+    return text(sql_query), params
+
+def to_float(value):
+    """Fixed-precision (DECIMAL) amounts come back as Decimal; the templates and JSON want floats."""
+    return None if value is None else float(value)
+
+def row_to_display(row):
+    """Maps a transactions result row to the dict keys used by the templates."""
+    return {
+        'bank_name': row[COL_BANK_NAME.strip('`')], # Use stripped name for dict key
+        'year': row[COL_YEAR.strip('`')],
+        'month': row[COL_MONTH.strip('`')],
+        'outward_count': row[COL_OUT_COUNT.strip('`')],
+        'outward_amount': to_float(row[COL_OUT_AMOUNT.strip('`')]),
+        'inward_count': row[COL_IN_COUNT.strip('`')],
+        'inward_amount': to_float(row[COL_IN_AMOUNT.strip('`')]),
+    }
+
+def period_key(period):
+    """Months since year 0 for a (year, month) pair: the period column of the prefix-sum tables."""
+    return period[0] * 12 + period[1] - 1
+
+PERIOD_MAX = period_key((9999, 12))
+
+def metric_totals(values):
+    """{metric column: total} for outward count, outward amount, inward count, inward amount values."""
+    return {col: (int(value) if col.endswith('_count') else float(value)) for col, value in zip(METRIC_COLUMNS, values)}
+
+# --- Query backends ---
+class SqlBackend:
+    """
+    Answers the routes' queries with SQL: rollup tables where they exist, else
+    the fact table, else the legacy per-month UNION ALL. columnar_store.ColumnarStore
+    implements the same methods in memory.
+    """
+
+    def has_data(self):
+        if has_fact_table() or get_neft_tables_info():
+            return True
+        warn_no_tables(get_data_version())
+        return False
+
+    def _source(self, rollup_table=None):
+        source_sql = build_rollup_source_sql(rollup_table) if rollup_table else build_source_sql()
+        if not source_sql: raise ChartError(f"Error: No {METRIC_NAME} data tables found.", 500)
+        return source_sql
+
+    def _fetch(self, sql, params=None):
+        with db.engine.connect() as connection:
+            return connection.execute(sql, params or {}).all()
+
+    def _where(self, filters):
+        where_clauses = []
+        if 'bank_name' in filters: where_clauses.append(f"{COL_BANK_NAME} = :bank_name")
+        if 'year' in filters: where_clauses.append(f"{COL_YEAR} = :year")
+        if 'month' in filters: where_clauses.append(f"{COL_MONTH} = :month")
+        return " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+
+    def monthly_series(self, filters):
+        """[(year, month, total count, total amount)] ascending by period, for the normalized filters."""
+        rollup_table = ROLLUP_BANK_MONTHLY if 'bank_name' in filters else ROLLUP_MONTHLY
+        sql = text(f"""
+            SELECT {COL_YEAR}, {COL_MONTH},
+                   SUM({COL_IN_COUNT} + {COL_OUT_COUNT}) as total_transactions,
+                   SUM({COL_IN_AMOUNT} + {COL_OUT_AMOUNT}) as total_amount
+            FROM {self._source(rollup_table)}{self._where(filters)}
+            GROUP BY {COL_YEAR}, {COL_MONTH}
+            ORDER BY {COL_YEAR} ASC, {COL_MONTH} ASC
+        """)
+        return [(int(y), int(m), int(count or 0), float(amount or 0)) for y, m, count, amount in self._fetch(sql, filters)]
+
+    def monthly_totals(self):
+        """[(year, month, total count, total amount)] ascending by period."""
+        return self.monthly_series({})
+
+    def top_banks(self, metric, limit=10, filters=None):
+        """[(bank name, total)] for the limit banks with the largest count or amount total."""
+        filters = filters or {}
+        total = f"SUM({COL_IN_COUNT} + {COL_OUT_COUNT})" if metric == 'count' else f"SUM({COL_IN_AMOUNT} + {COL_OUT_AMOUNT})"
+        # Per-bank totals are precomputed for all time; a period filter needs the monthly rollup
+        rollup_table = ROLLUP_BANK_MONTHLY if 'year' in filters or 'month' in filters else ROLLUP_BANK
+        sql = text(f"""
+            SELECT {COL_BANK_NAME}, {total} as total
+            FROM {self._source(rollup_table)}{self._where(filters)}
+            GROUP BY {COL_BANK_NAME}
+            ORDER BY total DESC
+            LIMIT :limit
+        """)
+        cast = int if metric == 'count' else float
+        return [(bank, cast(value or 0)) for bank, value in self._fetch(sql, dict(filters, limit=limit))]
+
+    def _window_where(self, start, end, filters=None):
+        """WHERE clause and params for the filters and the (year, month) window from start to end, inclusive."""
+        where_clauses, params = [], dict(filters or {})
+        if 'bank_name' in params: where_clauses.append(f"{COL_BANK_NAME} = :bank_name")
+        if start:
+            where_clauses.append(f"({COL_YEAR} > :start_year OR ({COL_YEAR} = :start_year AND {COL_MONTH} >= :start_month))")
+            params.update(start_year=start[0], start_month=start[1])
+        if end:
+            where_clauses.append(f"({COL_YEAR} < :end_year OR ({COL_YEAR} = :end_year AND {COL_MONTH} <= :end_month))")
+            params.update(end_year=end[0], end_month=end[1])
+        return (" WHERE " + " AND ".join(where_clauses) if where_clauses else ""), params
+
+    def top_banks_window(self, metric, start=None, end=None, limit=10):
+        """
+        ([(bank name, total)], others total, others bank count) for the limit banks with
+        the largest count or amount total from start to end ((year, month), inclusive;
+        None for open ended), plus the sum over every other bank in the window. Both
+        queries read the per-bank monthly rollup, one row per bank per month in the window.
+        """
+        total = f"SUM({COL_IN_COUNT} + {COL_OUT_COUNT})" if metric == 'count' else f"SUM({COL_IN_AMOUNT} + {COL_OUT_AMOUNT})"
+        where, params = self._window_where(start, end)
+        params['limit'] = limit
+        source_sql = self._source(ROLLUP_BANK_MONTHLY)
+        top = self._fetch(text(f"""
+            SELECT {COL_BANK_NAME}, {total} as total
+            FROM {source_sql}{where}
+            GROUP BY {COL_BANK_NAME}
+            ORDER BY total DESC, {COL_BANK_NAME} ASC
+            LIMIT :limit
+        """), params)
+        window_total, window_banks = self._fetch(text(f"""
+            SELECT {total}, COUNT(DISTINCT {COL_BANK_NAME}) FROM {source_sql}{where}
+        """), params)[0]
+        cast = int if metric == 'count' else float
+        rows = [(bank, cast(value or 0)) for bank, value in top]
+        others_total = cast(window_total or 0) - sum(value for _, value in rows)
+        return rows, others_total, int(window_banks or 0) - len(rows)
+
+    def range_totals(self, windows, bank_name=None):
+        """
+        [{metric column: total}] for each (start, end) window of (year, month) pairs
+        (inclusive; None for open ended), for one bank or for all banks. With the
+        prefix-sum tables each window is two index lookups: the running total at
+        its last month minus the running total before its first month.
+        """
+        table_name = CUMULATIVE_BANK_MONTHLY if bank_name else CUMULATIVE_MONTHLY
+        if table_name not in get_all_table_names():
+            return [self._range_total(start, end, bank_name) for start, end in windows]
+        bank_clause = f"{COL_BANK_NAME} = :bank_name AND " if bank_name else ""
+        sql = text(f"""
+            SELECT {COL_OUT_COUNT}, {COL_OUT_AMOUNT}, {COL_IN_COUNT}, {COL_IN_AMOUNT}
+            FROM `{table_name}` WHERE {bank_clause}`period` <= :period
+            ORDER BY `period` DESC LIMIT 1
+        """)
+        def running_total(connection, period):
+            row = connection.execute(sql, {'bank_name': bank_name, 'period': period}).first()
+            return [0 if value is None else value for value in row] if row else [0, 0, 0, 0]
+        results = []
+        with db.engine.connect() as connection:
+            for start, end in windows:
+                end_totals = running_total(connection, period_key(end) if end else PERIOD_MAX)
+                start_totals = running_total(connection, period_key(start) - 1) if start else [0, 0, 0, 0]
+                results.append(metric_totals(after - before for after, before in zip(end_totals, start_totals)))
+        return results
+
+    def _range_total(self, start, end, bank_name):
+        """One window's totals summed from the monthly rollups, for databases without the prefix-sum tables."""
+        where, params = self._window_where(start, end, {'bank_name': bank_name} if bank_name else {})
+        row = self._fetch(text(f"""
+            SELECT SUM({COL_OUT_COUNT}), SUM({COL_OUT_AMOUNT}), SUM({COL_IN_COUNT}), SUM({COL_IN_AMOUNT})
+            FROM {self._source(ROLLUP_BANK_MONTHLY if bank_name else ROLLUP_MONTHLY)}{where}
+        """), params)[0]
+        return metric_totals(0 if value is None else value for value in row)
+
+    def bank_monthly_counts(self, filters):
+        """[(year, month, total count)] ascending by period for the filtered bank."""
+        return [(year, month, count) for year, month, count, _ in self.monthly_series(filters)]
+
+    def filter_dimensions(self):
+        return load_filter_dimensions(get_data_version())
+
+    def transactions_page(self, filters, cursor=None, limit=100):
+        sql, params = build_transactions_query(self._source(ROLLUP_BANK_MONTHLY), filters, cursor=cursor, limit=limit)
+        with db.engine.connect() as connection:
+            return [row_to_display(row) for row in connection.execute(sql, params).mappings()]
+
+    def iter_transactions(self, filters, batch_size=1000):
+        """
+        Yields display rows from a server-side cursor (stream_results), so memory stays
+        constant however many rows match. The connection closes when the generator ends.
+        """
+        sql, params = build_transactions_query(self._source(ROLLUP_BANK_MONTHLY), filters)
+        with db.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(sql, params)
+            for row in result.mappings():
+                yield row_to_display(row)
+
+sql_backend = SqlBackend()
+
+@lru_cache(maxsize=1)
+def load_columnar_store(data_version):
+    """
+    Builds the in-memory backend for data_version: from the columnar snapshot when
+    it matches the ingest manifest, otherwise by reading every row from SQL once.
+    """
+    snapshot_dir = app.config['NEFT_SNAPSHOT_DIR']
+    meta = snapshot.read_meta(snapshot_dir)
+    if meta and MANIFEST_TABLE in get_all_table_names():
+        with db.engine.connect() as connection:
+            manifest_rows = connection.execute(text(f"SELECT `path`, `sha256` FROM `{MANIFEST_TABLE}`")).all()
+        if snapshot.source_digest(manifest_rows) == meta.get('source_digest'):
+            print(f"Loading in-memory backend from snapshot {snapshot_dir}")
+            return ColumnarStore.from_frame(snapshot.load_snapshot(snapshot_dir))
+    print("Loading in-memory backend from the database")
+    source_sql = build_source_sql()
+    if not source_sql:
+        return ColumnarStore.from_frame(pd.DataFrame(columns=['bank_name', 'year', 'month'] + METRIC_COLUMNS))
+    sql, params = build_transactions_query(source_sql, {})
+    with db.engine.connect() as connection:
+        df = pd.DataFrame([row_to_display(row) for row in connection.execute(sql, params).mappings()])
+    return ColumnarStore.from_frame(df)
+
+def get_backend():
+    """The configured query backend: NEFT_BACKEND = 'sql' (default) or 'memory'."""
+    if app.config['NEFT_BACKEND'] == 'memory':
+        return load_columnar_store(get_data_version())
+    return sql_backend
+
 # --- Flask Routes ---
 
+@app.context_processor
+def inject_metric_name():
+    return {'metric_name': METRIC_NAME}
+
 @app.route('/')
 def home():
     return render_template('home.html')
 
 @app.route('/filters')
 def select_filters():
-    tables_info = get_neft_tables_info()
-    if not tables_info: return "Error: No NEFT data tables found.", 500
-
-    # Build the common UNION ALL subquery
-    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
-    if not union_subquery_sql: return "Error: Could not build query.", 500
-
-    # DISTINCT queries operate on the result of the subquery
-    sql_distinct_banks = text(f"SELECT DISTINCT {COL_BANK_NAME} FROM ({union_subquery_sql}) AS combined_data ORDER BY {COL_BANK_NAME}")
-    sql_distinct_years = text(f"SELECT DISTINCT {COL_YEAR} FROM ({union_subquery_sql}) AS combined_data ORDER BY {COL_YEAR} DESC")
-    sql_distinct_months = text(f"SELECT DISTINCT {COL_MONTH} FROM ({union_subquery_sql}) AS combined_data ORDER BY {COL_MONTH} ASC")
+    backend = get_backend()
+    if not backend.has_data(): return f"Error: No {METRIC_NAME} data tables found.", 500
 
     try:
-        with db.session.begin():
-            all_banks = db.session.execute(sql_distinct_banks).scalars().all()
-            all_years = [int(y) for y in db.session.execute(sql_distinct_years).scalars().all() if y is not None]
-            all_months_num = [int(m) for m in db.session.execute(sql_distinct_months).scalars().all() if m is not None]
+        all_banks, periods = backend.filter_dimensions()
     except Exception as e:
         print(f"Error fetching filter options from DB: {e}")
         # It's better to return an error template than potentially break the page
         return render_template('error.html', message=f"Database error fetching filter options: {e}"), 500
         # Or provide empty lists: all_banks, all_years, all_months_num = [], [], []
 
+    all_years = sorted({year for year, _ in periods}, reverse=True)
+    all_months_num = sorted({month for _, month in periods})
     all_months_map = {month_num: get_month_name(month_num) for month_num in all_months_num}
 
     selected_bank = request.args.get('bank_name', "All Banks")
@@ -181,273 +641,517 @@ def select_filters():
 
 @app.route('/transactions')
 def view_transactions():
-    tables_info = get_neft_tables_info()
-    if not tables_info: return "Error: No NEFT data tables found.", 500
+    backend = get_backend()
+    if not backend.has_data(): return f"Error: No {METRIC_NAME} data tables found.", 500
 
     selected_bank = request.args.get('bank_name', "All Banks")
     selected_year = request.args.get('year', "All Years")
     selected_month_str = request.args.get('month', "All Months")
+    filters = normalize_filters(selected_bank, selected_year, selected_month_str)
+    filters_applied = bool(filters)
 
-    # Build the common UNION ALL subquery
-    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
-    if not union_subquery_sql: return "Error: Could not build base query.", 500
-
-    params = {}
-    # Outer query selects needed columns from the subquery result
-    sql_outer_select = f"""
-        SELECT {COL_BANK_NAME}, {COL_YEAR}, {COL_MONTH},
-               {COL_IN_COUNT}, {COL_OUT_COUNT},
-               {COL_IN_AMOUNT}, {COL_OUT_AMOUNT}
-        FROM ({union_subquery_sql}) AS combined_data
-    """
-    where_clauses = []
-    filters_applied = False
-
-    # Build WHERE clause using correct column constants (they refer to columns in combined_data)
-    if selected_bank != "All Banks":
-        where_clauses.append(f"{COL_BANK_NAME} = :bank")
-        params['bank'] = selected_bank
-        filters_applied = True
-    if selected_year != "All Years":
-        try:
-            where_clauses.append(f"{COL_YEAR} = :year")
-            params['year'] = int(selected_year)
-            filters_applied = True
-        except ValueError: pass
-    if selected_month_str != "All Months":
-        try:
-            where_clauses.append(f"{COL_MONTH} = :month")
-            params['month'] = int(selected_month_str)
-            filters_applied = True
-        except ValueError: pass
+    template_args = dict(
+        selected_bank=selected_bank, selected_year=selected_year, selected_month=selected_month_str,
+        filter_args=filters, filters_applied=filters_applied,
+        # Graph is loaded by the browser from its own image route
+        filtered_graph_url=url_for('transactions_graph_image', **filters) if 'bank_name' in filters else None,
+    )
 
-    if where_clauses:
-        sql_query = sql_outer_select + " WHERE " + " AND ".join(where_clauses)
-    else:
-        sql_query = sql_outer_select
+    # ?stream=1 renders every matching row straight from a server-side cursor
+    if request.args.get('stream') == '1':
+        return stream_template(
+            'transactions.html', data=backend.iter_transactions(filters),
+            streaming=True, next_cursor=None, page_size=None, **template_args
+        )
 
-    sql_query += f" ORDER BY {COL_YEAR} DESC, {COL_MONTH} DESC, {COL_BANK_NAME} ASC"
+    try:
+        page_size = int(request.args.get('page_size', app.config['TRANSACTIONS_PAGE_SIZE']))
+    except ValueError:
+        page_size = app.config['TRANSACTIONS_PAGE_SIZE']
+    page_size = max(1, min(page_size, app.config['TRANSACTIONS_MAX_PAGE_SIZE']))
+    cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
 
-    # Execute query for table data
+    # Fetch one extra row to know whether there is a next page
     data_to_display = []
     try:
-        with db.session.begin():
-            results = db.session.execute(text(sql_query), params).mappings().all()
-            # Process results into the format expected by the template
-            for row in results:
-                data_to_display.append({
-                    'bank_name': row[COL_BANK_NAME.strip('`')], # Use stripped name for dict key
-                    'year': row[COL_YEAR.strip('`')],
-                    'month': row[COL_MONTH.strip('`')],
-                    'outward_count': row[COL_OUT_COUNT.strip('`')],
-                    'outward_amount': row[COL_OUT_AMOUNT.strip('`')],
-                    'inward_count': row[COL_IN_COUNT.strip('`')],
-                    'inward_amount': row[COL_IN_AMOUNT.strip('`')],
-                })
+        data_to_display = backend.transactions_page(filters, cursor=cursor, limit=page_size + 1)
+        metrics.add_rows(len(data_to_display))
     except Exception as e:
         print(f"Error fetching filtered transaction data: {e}")
         # Optionally return an error template
         # return render_template('error.html', message=f"Error retrieving data: {e}"), 500
 
-    # --- Generate Conditional Filtered Graph ---
-    filtered_graph_html = None
-    if filters_applied and selected_bank != "All Banks" and data_to_display:
-        # We already have the filtered data in 'data_to_display', no need for another SQL query.
-        # Let's process this data for the graph.
-        try:
-            plot_data = []
-            # Convert list of dicts to DataFrame for easy plotting
-            plot_source_df = pd.DataFrame(data_to_display)
-
-            # Check if necessary columns exist (they should based on the mapping above)
-            if not plot_source_df.empty and all(col in plot_source_df.columns for col in ['year', 'month', 'inward_count', 'outward_count']):
-                plot_source_df['total_transactions'] = plot_source_df['inward_count'] + plot_source_df['outward_count']
-                # Create datetime, handle potential errors during conversion
-                plot_source_df['Month_Year'] = pd.to_datetime(
-                    plot_source_df['year'].astype(str) + '-' + plot_source_df['month'].astype(str) + '-01',
-                    errors='coerce' # Set errors='coerce' to turn bad dates into NaT
-                )
-                plot_source_df.dropna(subset=['Month_Year'], inplace=True) # Remove rows with invalid dates
-
-                # Group by month (even if only one year/month is selected, this aggregates correctly)
-                plot_df_grouped = plot_source_df.groupby('Month_Year')['total_transactions'].sum().reset_index()
-                plot_df_grouped = plot_df_grouped.sort_values(by='Month_Year') # Sort chronologically
-
-                if not plot_df_grouped.empty:
-                    # Create Plot
-                    fig, ax = plt.subplots(figsize=(12, 6))
-                    ax.plot(plot_df_grouped['Month_Year'], plot_df_grouped['total_transactions'], marker='o', linestyle='-', color='purple')
-                    # ... (Set title, labels, grid etc. as before) ...
-                    title = f'Monthly Transaction Volume for: {selected_bank}'
-                    if selected_year != "All Years": title += f' (Year: {selected_year})'
-                    if selected_month_str != "All Months": title += f' (Month: {get_month_name(selected_month_str)})'
-                    ax.set_title(title)
-                    ax.set_xlabel('Month-Year')
-                    ax.set_ylabel('Total Transactions (Inward + Outward)')
-                    ax.grid(True, linestyle='--', alpha=0.6)
-                    ax.ticklabel_format(style='plain', axis='y')
-                    plt.xticks(rotation=45)
-                    fig.tight_layout()
-                    filtered_graph_html = plot_to_img(fig)
-        except Exception as e:
-            print(f"Error generating filtered graph from processed data for {selected_bank}: {e}")
+    next_cursor = None
+    if len(data_to_display) > page_size:
+        data_to_display = data_to_display[:page_size]
+        next_cursor = encode_cursor(data_to_display[-1])
+    if not data_to_display:
+        template_args['filtered_graph_url'] = None
 
     return render_template(
         'transactions.html',
         data=data_to_display, # Use the processed data
-        selected_bank=selected_bank, selected_year=selected_year, selected_month=selected_month_str,
-        filtered_graph=filtered_graph_html
+        streaming=False, next_cursor=next_cursor, page_size=page_size,
+        is_first_page=cursor is None, **template_args
     )
 
-# --- Graph Routes (Using direct SQL with UNION ALL and CORRECT columns) ---
+# --- Export (streamed CSV / NDJSON from a server-side cursor) ---
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_COLUMNS = ['bank_name', 'year', 'month', 'outward_count', 'outward_amount', 'inward_count', 'inward_amount']
+EXPORT_CHUNK_ROWS = 1000
+
+def export_chunks(rows, fmt):
+    """Encodes display rows as CSV or NDJSON, yielding one string per EXPORT_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        write = lambda row: writer.writerow([row[col] for col in EXPORT_COLUMNS])
+    else:
+        write = lambda row: buffer.write(json.dumps({col: row[col] for col in EXPORT_COLUMNS}) + "\n")
+    # Send the header straight away, before the query has produced any rows
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for count, row in enumerate(rows, 1):
+        write(row)
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route('/transactions/export')
+def export_transactions():
+    """
+    Every transaction row matching the bank_name/year/month filters as ?format=csv
+    (default) or ndjson, streamed in chunks so memory stays flat for any export size.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_MIMETYPES: return f"Unsupported export format: {fmt}", 400
+    backend = get_backend()
+    if not backend.has_data(): return f"Error: No {METRIC_NAME} data tables found.", 500
+    filters = request_filters()
+    slug = "_".join(re.sub(r'[^A-Za-z0-9]+', '-', str(filters[name])).strip('-') for name in ('bank_name', 'year', 'month') if name in filters)
+    filename = f"{TABLE_PREFIX}_transactions{'_' + slug if slug else ''}.{fmt}"
+    return Response(
+        stream_with_context(export_chunks(backend.iter_transactions(filters), fmt)),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@app.route('/transactions/graph.png')
+def transactions_graph_image():
+    filters = normalize_filters(
+        request.args.get('bank_name', "All Banks"),
+        request.args.get('year', "All Years"),
+        request.args.get('month', "All Months"),
+    )
+    if 'bank_name' not in filters: return "A bank_name filter is required.", 400
+    return serve_chart_image('transactions', filters, lambda fmt: render_filtered_graph(filters, fmt))
+
+def render_filtered_graph(filters, fmt='png'):
+    """Plots the monthly volume for the filtered bank; returns image bytes or None if nothing to plot."""
+    results = get_backend().bank_monthly_counts(filters)
+    metrics.add_rows(len(results))
+    if not results:
+        return None
+    with metrics.timed('pandas'):
+        plot_df = pd.DataFrame(results, columns=['Year', 'Month', 'total_transactions'])
+        # Create datetime, handle potential errors during conversion
+        plot_df['Month_Year'] = pd.to_datetime(
+            plot_df['Year'].astype(str) + '-' + plot_df['Month'].astype(str) + '-01',
+            errors='coerce' # Set errors='coerce' to turn bad dates into NaT
+        )
+        plot_df.dropna(subset=['Month_Year'], inplace=True) # Remove rows with invalid dates
+    if plot_df.empty:
+        return None
+
+    title = f"Monthly Transaction Volume for: {filters['bank_name']}"
+    if 'year' in filters: title += f" (Year: {filters['year']})"
+    if 'month' in filters: title += f" (Month: {get_month_name(filters['month'])})"
+    return render_chart({
+        'kind': 'line', 'x': month_year_labels(plot_df), 'y': plot_df['total_transactions'].tolist(), 'dates': True,
+        'figsize': (12, 6), 'color': 'purple', 'marker': 'o', 'title': title,
+        'xlabel': 'Month-Year', 'ylabel': 'Total Transactions (Inward + Outward)',
+        'grid': True, 'plain_axis': 'y', 'xtick_rotation': 45, 'format': fmt,
+    })
+
+# --- Graph Routes (data from the configured backend; SQL reads the rollup tables) ---
+CRORE = 10000000.0 # Amounts are plotted in crores
+
+def monthly_plot_frame(graph_num):
+    """Monthly totals as a DataFrame with a Month_Year datetime column."""
+    results = get_backend().monthly_totals()
+    metrics.add_rows(len(results))
+    if not results: raise ChartError(f"No data for Graph {graph_num}.", 404)
+    with metrics.timed('pandas'):
+        plot_df = pd.DataFrame(results, columns=['year', 'month', 'total_transactions', 'total_amount'])
+        plot_df['Month_Year'] = pd.to_datetime(plot_df[['year', 'month']].assign(day=1), errors='coerce')
+        plot_df = plot_df.dropna(subset=['Month_Year'])
+    if plot_df.empty: raise ChartError(f"Could not process data for Graph {graph_num}.", 500)
+    return plot_df
+
+def month_year_labels(plot_df):
+    """Month_Year as ISO date strings for a plot spec."""
+    return plot_df['Month_Year'].dt.strftime('%Y-%m-%d').tolist()
+
+def render_graph1(fmt='png'):
+    plot_df = monthly_plot_frame(1)
+    return render_chart({
+        'kind': 'line', 'x': month_year_labels(plot_df), 'y': plot_df['total_transactions'].tolist(), 'dates': True,
+        'figsize': (12, 7), 'color': 'dodgerblue', 'marker': 'o',
+        'title': f'Monthly {METRIC_NAME} Volume Trend (All Banks Combined)',
+        'xlabel': 'Month-Year', 'ylabel': 'Total Number of Transactions',
+        'grid': True, 'plain_axis': 'y', 'xtick_rotation': 45, 'format': fmt,
+    })
+
+def render_graph2(fmt='png'):
+    plot_df = monthly_plot_frame(2)
+    return render_chart({
+        'kind': 'area', 'x': month_year_labels(plot_df), 'y': (plot_df['total_amount'] / CRORE).tolist(), 'dates': True,
+        'figsize': (12, 7), 'color': 'mediumseagreen', 'line_color': 'darkgreen', 'marker': '.',
+        'title': f'Monthly {METRIC_NAME} Value Trend (All Banks Combined)',
+        'xlabel': 'Month-Year', 'ylabel': 'Total Amount (₹ Crores)',
+        'grid': True, 'plain_axis': 'y', 'xtick_rotation': 45, 'format': fmt,
+    })
+
+def render_graph3(fmt='png'):
+    results = get_backend().top_banks('count', limit=10)
+    metrics.add_rows(len(results))
+    if not results: raise ChartError("No data for Graph 3.", 404)
+    banks = [bank for bank, _ in results]
+    transactions = [total for _, total in results]
+    return render_chart({
+        'kind': 'barh', 'x': banks[::-1], 'y': transactions[::-1],
+        'figsize': (10, 8), 'color': 'skyblue',
+        'title': 'Top 10 Banks by Total Transaction Count', 'xlabel': 'Total Number of Transactions',
+        'plain_axis': 'x', 'format': fmt,
+    })
+
+def render_graph4(fmt='png'):
+    results = get_backend().top_banks('amount', limit=10)
+    metrics.add_rows(len(results))
+    if not results: raise ChartError("No data for Graph 4.", 404)
+    banks = [bank for bank, _ in results]
+    amounts = [total / CRORE for _, total in results]
+    return render_chart({
+        'kind': 'bar', 'x': banks, 'y': amounts,
+        'figsize': (12, 8), 'color': 'lightcoral',
+        'title': f'Top 10 Banks by Total {METRIC_NAME} Amount', 'ylabel': 'Total Amount (₹ Crores)',
+        'plain_axis': 'y', 'xtick_rotation': 60, 'xtick_ha': 'right', 'format': fmt,
+    })
+
+def month_label(period):
+    return f"{calendar.month_abbr[period[1]]} {period[0]}"
+
+def render_graph5(metric, limit, start, end, fmt='png'):
+    """Top banks by count or amount over a (start, end) month window, with every other bank as one Others bar."""
+    rows, others_total, others_banks = get_backend().top_banks_window(metric, start, end, limit)
+    metrics.add_rows(len(rows))
+    if not rows: raise ChartError("No data for the selected window.", 404)
+    colors = ['skyblue' if metric == 'count' else 'lightcoral'] * len(rows)
+    if others_banks:
+        rows = rows + [(f"Others ({others_banks} banks)", others_total)]
+        colors.append('lightgray')
+    scale = 1 if metric == 'count' else CRORE
+    window = f"{month_label(start) if start else 'First Month'} to {month_label(end) if end else 'Latest Month'}"
+    return render_chart({
+        'kind': 'barh', 'x': [bank for bank, _ in rows][::-1], 'y': [total / scale for _, total in rows][::-1],
+        'figsize': (10, 8), 'color': colors[::-1],
+        'title': f"Top {limit} Banks by {'Transaction Count' if metric == 'count' else METRIC_NAME + ' Amount'}, {window}",
+        'xlabel': 'Total Number of Transactions' if metric == 'count' else 'Total Amount (₹ Crores)',
+        'plain_axis': 'x', 'format': fmt,
+    })
+
+# The graph pages render immediately; the browser fetches the image from the .png route
 @app.route('/graph1') # Monthly Volume
 def graph1():
-    tables_info = get_neft_tables_info()
-    if not tables_info: return "Error: No NEFT data tables found.", 500
-    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
-    if not union_subquery_sql: return "Error: Could not build query for Graph 1.", 500
-
-    sql = text(f"""
-        SELECT {COL_YEAR}, {COL_MONTH}, SUM({COL_IN_COUNT} + {COL_OUT_COUNT}) as total_transactions
-        FROM ({union_subquery_sql}) AS combined_data
-        GROUP BY {COL_YEAR}, {COL_MONTH}
-        ORDER BY {COL_YEAR} ASC, {COL_MONTH} ASC
-    """)
-    try:
-        with db.session.begin():
-            results = db.session.execute(sql).mappings().all()
-        if not results: return "No data for Graph 1.", 404
-        plot_data = []
-        for row in results:
-           try:
-               # Use stripped keys matching aliases
-               dt = pd.to_datetime(f"{int(row[COL_YEAR.strip('`')])}-{int(row[COL_MONTH.strip('`')])}-01")
-               plot_data.append({'Month_Year': dt, 'total_transactions': row['total_transactions']})
-           except (ValueError, TypeError, KeyError): continue
-        if not plot_data: return "Could not process data for Graph 1.", 500
-        plot_df = pd.DataFrame(plot_data)
-        fig, ax = plt.subplots(figsize=(12, 7))
-        ax.plot(plot_df['Month_Year'], plot_df['total_transactions'], marker='o', linestyle='-', color='dodgerblue')
-        ax.set_title('Monthly NEFT Volume Trend (All Banks Combined)')
-        ax.set_xlabel('Month-Year')
-        ax.set_ylabel('Total Number of Transactions')
-        ax.grid(True, linestyle='--', alpha=0.6)
-        ax.ticklabel_format(style='plain', axis='y')
-        plt.xticks(rotation=45)
-        fig.tight_layout()
-        img_data = plot_to_img(fig)
-        return render_template('graph.html', img_data=img_data, graph_title="Monthly NEFT Volume")
-    except Exception as e:
-        print(f"Error generating graph 1: {e}")
-        return "Error generating graph.", 500
+    return render_template('graph.html', img_url=url_for('graph1_image'), graph_title=f"Monthly {METRIC_NAME} Volume")
 
 @app.route('/graph2') # Monthly Value
 def graph2():
-    tables_info = get_neft_tables_info()
-    if not tables_info: return "Error: No NEFT data tables found.", 500
-    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
-    if not union_subquery_sql: return "Error: Could not build query for Graph 2.", 500
-
-    sql = text(f"""
-        SELECT {COL_YEAR}, {COL_MONTH}, SUM({COL_IN_AMOUNT} + {COL_OUT_AMOUNT}) / 10000000.0 as total_amount_cr
-        FROM ({union_subquery_sql}) AS combined_data
-        GROUP BY {COL_YEAR}, {COL_MONTH}
-        ORDER BY {COL_YEAR} ASC, {COL_MONTH} ASC
-    """)
-    try:
-        with db.session.begin():
-            results = db.session.execute(sql).mappings().all()
-        if not results: return "No data for Graph 2.", 404
-        plot_data = []
-        for row in results:
-           try:
-               dt = pd.to_datetime(f"{int(row[COL_YEAR.strip('`')])}-{int(row[COL_MONTH.strip('`')])}-01")
-               amount = float(row['total_amount_cr']) if row['total_amount_cr'] is not None else 0.0
-               plot_data.append({'Month_Year': dt, 'total_amount': amount})
-           except (ValueError, TypeError, KeyError): continue
-        if not plot_data: return "Could not process data for Graph 2.", 500
-        plot_df = pd.DataFrame(plot_data)
-        fig, ax = plt.subplots(figsize=(12, 7))
-        ax.fill_between(plot_df['Month_Year'], plot_df['total_amount'], alpha=0.4, color='mediumseagreen')
-        ax.plot(plot_df['Month_Year'], plot_df['total_amount'], marker='.', linestyle='-', color='darkgreen')
-        ax.set_title('Monthly NEFT Value Trend (All Banks Combined)')
-        ax.set_xlabel('Month-Year')
-        ax.set_ylabel('Total Amount (₹ Crores)')
-        ax.grid(True, linestyle='--', alpha=0.6)
-        ax.ticklabel_format(style='plain', axis='y')
-        plt.xticks(rotation=45)
-        fig.tight_layout()
-        img_data = plot_to_img(fig)
-        return render_template('graph.html', img_data=img_data, graph_title="Monthly NEFT Value")
-    except Exception as e:
-        print(f"Error generating graph 2: {e}")
-        return "Error generating graph.", 500
+    return render_template('graph.html', img_url=url_for('graph2_image'), graph_title=f"Monthly {METRIC_NAME} Value")
 
 @app.route('/graph3') # Top Banks by Count
 def graph3():
-    tables_info = get_neft_tables_info()
-    if not tables_info: return "Error: No NEFT data tables found.", 500
-    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
-    if not union_subquery_sql: return "Error: Could not build query for Graph 3.", 500
-
-    sql = text(f"""
-        SELECT {COL_BANK_NAME}, SUM({COL_IN_COUNT} + {COL_OUT_COUNT}) as total_transactions
-        FROM ({union_subquery_sql}) AS combined_data
-        GROUP BY {COL_BANK_NAME}
-        ORDER BY total_transactions DESC
-        LIMIT 10
-    """)
-    try:
-        with db.session.begin():
-            results = db.session.execute(sql).mappings().all()
-        if not results: return "No data for Graph 3.", 404
-        # Use stripped key 'Bank Name'
-        banks = [row[COL_BANK_NAME.strip('`')] for row in results]
-        transactions = [row['total_transactions'] for row in results]
-        fig, ax = plt.subplots(figsize=(10, 8))
-        ax.barh(banks[::-1], transactions[::-1], color='skyblue')
-        ax.set_title('Top 10 Banks by Total Transaction Count')
-        ax.set_xlabel('Total Number of Transactions')
-        ax.ticklabel_format(style='plain', axis='x')
-        fig.tight_layout()
-        img_data = plot_to_img(fig)
-        return render_template('graph.html', img_data=img_data, graph_title="Top Banks by Transaction Count")
-    except Exception as e:
-        print(f"Error generating graph 3: {e}")
-        return "Error generating graph.", 500
+    return render_template('graph.html', img_url=url_for('graph3_image'), graph_title="Top Banks by Transaction Count")
 
 @app.route('/graph4') # Top Banks by Amount
 def graph4():
-    tables_info = get_neft_tables_info()
-    if not tables_info: return "Error: No NEFT data tables found.", 500
-    union_subquery_sql = build_union_all_subquery(tables_info=tables_info)
-    if not union_subquery_sql: return "Error: Could not build query for Graph 4.", 500
-
-    sql = text(f"""
-        SELECT {COL_BANK_NAME}, SUM({COL_IN_AMOUNT} + {COL_OUT_AMOUNT}) / 10000000.0 as total_amount_cr
-        FROM ({union_subquery_sql}) AS combined_data
-        GROUP BY {COL_BANK_NAME}
-        ORDER BY total_amount_cr DESC
-        LIMIT 10
-    """)
+    return render_template('graph.html', img_url=url_for('graph4_image'), graph_title="Top Banks by Transaction Value")
+
+@app.route('/graph5') # Top Banks over a month window
+def graph5():
+    backend = get_backend()
+    if not backend.has_data(): return f"Error: No {METRIC_NAME} data tables found.", 500
     try:
-        with db.session.begin():
-            results = db.session.execute(sql).mappings().all()
-        if not results: return "No data for Graph 4.", 404
-        banks = [row[COL_BANK_NAME.strip('`')] for row in results]
-        amounts = [float(row['total_amount_cr']) if row['total_amount_cr'] is not None else 0.0 for row in results]
-        fig, ax = plt.subplots(figsize=(12, 8))
-        ax.bar(banks, amounts, color='lightcoral')
-        ax.set_title('Top 10 Banks by Total NEFT Amount')
-        ax.set_ylabel('Total Amount (₹ Crores)')
-        ax.ticklabel_format(style='plain', axis='y')
-        plt.xticks(rotation=60, ha='right')
-        fig.tight_layout()
-        img_data = plot_to_img(fig)
-        return render_template('graph.html', img_data=img_data, graph_title="Top Banks by Transaction Value")
+        params, _, _ = top_banks_window_params()
+    except ValueError as e:
+        return str(e), 400
+    _, periods = backend.filter_dimensions()
+    return render_template(
+        'top_banks.html', img_url=url_for('graph5_image', **params), graph_title="Top Banks over a Window",
+        periods=[(f"{year:04d}-{month:02d}", month_label((year, month))) for year, month in periods], params=params,
+    )
+
+@app.route('/graph1.png')
+def graph1_image():
+    return serve_chart_image('graph1', {}, render_graph1)
+
+@app.route('/graph2.png')
+def graph2_image():
+    return serve_chart_image('graph2', {}, render_graph2)
+
+@app.route('/graph3.png')
+def graph3_image():
+    return serve_chart_image('graph3', {}, render_graph3)
+
+@app.route('/graph4.png')
+def graph4_image():
+    return serve_chart_image('graph4', {}, render_graph4)
+
+@app.route('/graph5.png')
+def graph5_image():
+    try:
+        params, start, end = top_banks_window_params()
+    except ValueError as e:
+        return str(e), 400
+    return serve_chart_image('graph5', params, lambda fmt: render_graph5(params['metric'], params['n'], start, end, fmt))
+
+# --- JSON series API (columnar arrays, so charts can be drawn in the browser) ---
+TOP_BANKS_MAX_LIMIT = 100
+
+def parse_month_param(value):
+    """(year, month) for a ?start= / ?end= value such as 2023-04, or None when it is empty."""
+    if not value:
+        return None
+    year, month = (int(part) for part in value.split('-'))
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month: {value}")
+    return year, month
+
+def top_banks_window_params():
+    """
+    Returns (params, start, end) for the windowed Top-N routes: the normalized
+    metric, n, start and end query args (for cache keys) and the window as
+    (year, month) tuples. Raises ValueError with the message for a 400.
+    """
+    metric = request.args.get('metric', 'count')
+    if metric not in ('count', 'amount'): raise ValueError(f"Unsupported metric: {metric}")
+    try:
+        limit = int(request.args.get('n', 10))
+    except ValueError:
+        limit = 10
+    params = {'metric': metric, 'n': max(1, min(limit, TOP_BANKS_MAX_LIMIT))}
+    try:
+        start, end = parse_month_param(request.args.get('start')), parse_month_param(request.args.get('end'))
+    except ValueError:
+        raise ValueError("start and end must be months written as YYYY-MM")
+    if start and end and start > end: raise ValueError("start must not be after end")
+    if start: params['start'] = f"{start[0]:04d}-{start[1]:02d}"
+    if end: params['end'] = f"{end[0]:04d}-{end[1]:02d}"
+    return params, start, end
+
+def request_filters():
+    return normalize_filters(
+        request.args.get('bank_name', "All Banks"),
+        request.args.get('year', "All Years"),
+        request.args.get('month', "All Months"),
+    )
+
+def serve_series(route_name, params, build):
+    """
+    JSON response for build() plus the applied params and data version, with an
+    ETag tied to the data version like the chart images.
+    """
+    key = chart_key(route_name, params)
+    if key in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{key}"'})
+    try:
+        series = build()
+    except ChartError as e:
+        return jsonify(error=e.message), e.status
     except Exception as e:
-        print(f"Error generating graph 4: {e}")
-        return "Error generating graph.", 500
+        print(f"Error building {route_name} series: {e}")
+        return jsonify(error="Error building series."), 500
+    metrics.add_rows(len(next(iter(series.values()), [])))
+    response = jsonify(params=params, data_version=get_data_version(), **series)
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
+
+@app.route('/api/series/monthly')
+def monthly_series_api():
+    """Monthly volume and value (graph1, graph2 and the filtered graph) as {year, month, count, amount_crore} arrays."""
+    filters = request_filters()
+    def build():
+        rows = get_backend().monthly_series(filters)
+        return {
+            'year': [row[0] for row in rows],
+            'month': [row[1] for row in rows],
+            'count': [row[2] for row in rows],
+            'amount_crore': [row[3] / CRORE for row in rows],
+        }
+    return serve_series('api_monthly', filters, build)
+
+@app.route('/api/series/top-banks')
+def top_banks_api():
+    """Top banks by count or amount (graph3, graph4) as {bank_name, total} arrays; amount totals are in crores."""
+    metric = request.args.get('metric', 'count')
+    if metric not in ('count', 'amount'): return jsonify(error=f"Unsupported metric: {metric}"), 400
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, TOP_BANKS_MAX_LIMIT))
+    filters = request_filters()
+    def build():
+        rows = get_backend().top_banks(metric, limit=limit, filters=filters)
+        totals = [total / CRORE for _, total in rows] if metric == 'amount' else [total for _, total in rows]
+        return {'bank_name': [bank for bank, _ in rows], 'total': totals}
+    return serve_series('api_top_banks', dict(filters, metric=metric, limit=limit), build)
+
+@app.route('/api/series/top-banks/window')
+def top_banks_window_api():
+    """
+    Top n banks by count or amount between the start and end months (YYYY-MM,
+    inclusive, either optional) as {bank_name, total} arrays ending with an
+    Others row for the remaining banks; amount totals are in crores.
+    """
+    try:
+        params, start, end = top_banks_window_params()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    def build():
+        rows, others_total, others_banks = get_backend().top_banks_window(params['metric'], start, end, params['n'])
+        if others_banks:
+            rows = rows + [("Others", others_total)]
+        totals = [total / CRORE for _, total in rows] if params['metric'] == 'amount' else [total for _, total in rows]
+        return {'bank_name': [bank for bank, _ in rows], 'total': totals, 'others_banks': others_banks}
+    return serve_series('api_top_banks_window', params, build)
+
+FISCAL_YEARS_MAX = 100
+
+def parse_fiscal_year(value):
+    """Starting year of a fiscal year (April to March) written as 2019, 2019-20 or 2019-2020."""
+    first, _, second = value.partition('-')
+    year = int(first)
+    if second and int(second) not in ((year + 1) % 100, year + 1):
+        raise ValueError(f"Invalid fiscal year: {value}")
+    return year
+
+def fiscal_year_label(year):
+    return f"FY{year}-{(year + 1) % 100:02d}"
+
+def range_windows():
+    """
+    Returns (params, windows) for /api/series/range: the normalized query args
+    (for cache keys) and [(label, start, end)] windows of (year, month) pairs.
+    Windows come from ?fy= (optionally through ?fy_end=, and one window per
+    fiscal year with ?split=fy) or from ?start= / ?end= months. Raises
+    ValueError with the message for a 400.
+    """
+    params = {}
+    bank_name = request.args.get('bank_name', "All Banks")
+    if bank_name and bank_name != "All Banks": params['bank_name'] = bank_name.strip()
+    split = request.args.get('split')
+    if request.args.get('fy'):
+        try:
+            first = parse_fiscal_year(request.args['fy'])
+            last = parse_fiscal_year(request.args['fy_end']) if request.args.get('fy_end') else first
+        except ValueError:
+            raise ValueError("fy and fy_end must be fiscal years written as YYYY or YYYY-YY")
+        if last < first: raise ValueError("fy_end must not be before fy")
+        if last - first >= FISCAL_YEARS_MAX: raise ValueError(f"At most {FISCAL_YEARS_MAX} fiscal years per request")
+        params.update(fy=first, fy_end=last)
+        if split == 'fy':
+            params['split'] = 'fy'
+            return params, [(fiscal_year_label(year), (year, 4), (year + 1, 3)) for year in range(first, last + 1)]
+        label = fiscal_year_label(first) if first == last else f"{fiscal_year_label(first)} to {fiscal_year_label(last)}"
+        return params, [(label, (first, 4), (last + 1, 3))]
+    if split: raise ValueError("split=fy needs a fy window")
+    try:
+        start, end = parse_month_param(request.args.get('start')), parse_month_param(request.args.get('end'))
+    except ValueError:
+        raise ValueError("start and end must be months written as YYYY-MM")
+    if start and end and start > end: raise ValueError("start must not be after end")
+    if start: params['start'] = f"{start[0]:04d}-{start[1]:02d}"
+    if end: params['end'] = f"{end[0]:04d}-{end[1]:02d}"
+    label = f"{month_label(start) if start else 'First Month'} to {month_label(end) if end else 'Latest Month'}"
+    return params, [(label, start, end)]
+
+@app.route('/api/series/range')
+def range_series_api():
+    """
+    Totals of all four metrics for one bank (?bank_name=) or all banks over
+    contiguous month windows, e.g. ?fy=2019&fy_end=2022&split=fy for each
+    fiscal year from April 2019 to March 2023. Arrays have one entry per
+    window; amounts are in crores. Answered from the prefix-sum tables.
+    """
+    try:
+        params, windows = range_windows()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    def build():
+        totals = get_backend().range_totals([(start, end) for _, start, end in windows], params.get('bank_name'))
+        series = {
+            'label': [label for label, _, _ in windows],
+            'start': [f"{start[0]:04d}-{start[1]:02d}" if start else None for _, start, _ in windows],
+            'end': [f"{end[0]:04d}-{end[1]:02d}" if end else None for _, _, end in windows],
+        }
+        for col in METRIC_COLUMNS:
+            key = col if col.endswith('_count') else f"{col}_crore"
+            series[key] = [row[col] if col.endswith('_count') else row[col] / CRORE for row in totals]
+        return series
+    return serve_series('api_range', params, build)
+
+@app.route('/cache/stats')
+def chart_cache_stats():
+    return jsonify(chart_cache.get_stats())
+
+def cache_metrics():
+    """Prometheus lines for the chart cache, render pool, table catalog and the lru_cache'd data loaders."""
+    stats = chart_cache.get_stats()
+    lines = []
+    for name in ('hits', 'disk_hits', 'misses', 'evictions', 'disk_evictions'):
+        lines += [f"# TYPE {TABLE_PREFIX}_chart_cache_{name}_total counter", f"{TABLE_PREFIX}_chart_cache_{name}_total {stats[name]}"]
+    lines += [f"# TYPE {TABLE_PREFIX}_chart_cache_entries gauge", f"{TABLE_PREFIX}_chart_cache_entries {stats['entries']}"]
+    render_stats = render_pool.get_stats()
+    for name in ('rendered', 'busy', 'timeouts', 'errors', 'hung'):
+        lines += [f"# TYPE {TABLE_PREFIX}_render_{name}_total counter", f"{TABLE_PREFIX}_render_{name}_total {render_stats[name]}"]
+    catalog_stats = catalog.get_stats()
+    lines += [f"# TYPE {TABLE_PREFIX}_catalog_polls_total counter", f"{TABLE_PREFIX}_catalog_polls_total {catalog_stats['polls']}"]
+    lines += [f"# TYPE {TABLE_PREFIX}_catalog_reloads_total counter", f"{TABLE_PREFIX}_catalog_reloads_total {catalog_stats['reloads']}"]
+    lines += [f"# TYPE {TABLE_PREFIX}_catalog_tables gauge", f"{TABLE_PREFIX}_catalog_tables {catalog_stats['tables']}"]
+    cached_functions = (load_filter_dimensions, load_columnar_store)
+    for field in ('hits', 'misses'):
+        lines.append(f"# TYPE {TABLE_PREFIX}_function_cache_{field}_total counter")
+        for cached in cached_functions:
+            lines.append(f'{TABLE_PREFIX}_function_cache_{field}_total{{function="{cached.__name__}"}} {getattr(cached.cache_info(), field)}')
+    return lines
+
+metrics.add_collector(cache_metrics)
+
+def admin_allowed():
+    token = app.config['ADMIN_TOKEN']
+    if token:
+        return request.headers.get('X-Admin-Token', request.args.get('token')) == token
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/slow-queries')
+def slow_queries():
+    if not admin_allowed(): return "Forbidden", 403
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        limit = 20
+    return jsonify(query_profiler.report(limit=limit))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 # --- Main execution block ---
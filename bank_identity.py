@@ -0,0 +1,90 @@
+import re
+import difflib
+import unicodedata
+
+# Tokens that don't tell banks apart ("The X Bank Ltd" == "X Bank Limited")
+_DROP_TOKENS = {"the", "ltd", "limited"}
+_COOPERATIVE = re.compile(r"\bco\s*-?\s*op(?:erative)?\b")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name):
+    """
+    Lookup key for a raw bank name: accents, case, punctuation and spacing
+    folded, "&" read as "and", every co-op spelling as "cooperative", and the
+    "The"/"Ltd"/"Limited" tokens dropped.
+    """
+    key = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii').casefold()
+    key = _COOPERATIVE.sub("cooperative", key.replace("&", " and "))
+    return " ".join(token for token in _NON_ALNUM.sub(" ", key).split() if token not in _DROP_TOKENS)
+
+
+class BankResolver:
+    """
+    Maps raw bank names to canonical bank ids through their normalized keys.
+
+    aliases is {key: bank_id}; a known key is a dict lookup. An unknown key is
+    tried against manual ({alias key: canonical name}), then, with fuzzy_cutoff
+    set, against the known keys with difflib; otherwise create_bank(raw name)
+    makes it a new bank. Every key learned that way is kept in new_aliases
+    for the caller to persist, and fuzzy matches and new banks are reported.
+    Manual aliases that lead back to themselves (A -> B -> A) raise ValueError.
+    """
+
+    def __init__(self, aliases, create_bank, manual=None, fuzzy_cutoff=None):
+        self.index = dict(aliases)
+        self.seeded = bool(self.index)
+        self.create_bank = create_bank
+        # An alias that normalizes to its own canonical name would resolve to itself
+        self.manual = {key: name for key, name in (manual or {}).items() if normalize_name(name) != key}
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.new_aliases = []  # (key, raw name, bank_id, method, score)
+        self.fuzzy_matches = []  # (raw name, matched key, score)
+        self.new_banks = []  # raw names that matched no known bank
+
+    def resolve(self, raw_name, _chain=()):
+        key = normalize_name(raw_name)
+        bank_id = self.index.get(key)
+        if bank_id is not None:
+            return bank_id
+        if key in self.manual:
+            # _chain holds the alias keys being followed, to catch aliases that loop
+            if key in _chain:
+                cycle = " -> ".join(repr(alias_key) for alias_key in _chain + (key,))
+                raise ValueError(f"Manual bank aliases form a cycle: {cycle}")
+            bank_id, method, score = self.resolve(self.manual[key], _chain + (key,)), 'manual', None
+        else:
+            match = self._fuzzy_match(key)
+            if match:
+                bank_id, method, score = self.index[match[0]], 'fuzzy', match[1]
+                self.fuzzy_matches.append((raw_name, match[0], score))
+            else:
+                bank_id, method, score = self.create_bank(str(raw_name).strip()), 'name', None
+                self.new_banks.append(raw_name)
+        self.index[key] = bank_id
+        self.new_aliases.append((key, raw_name, bank_id, method, score))
+        return bank_id
+
+    def _fuzzy_match(self, key):
+        """(known key, similarity) of the closest known key at or above fuzzy_cutoff, or None."""
+        if not self.fuzzy_cutoff or not self.index:
+            return None
+        matches = difflib.get_close_matches(key, list(self.index), n=1, cutoff=self.fuzzy_cutoff)
+        if not matches:
+            return None
+        return matches[0], round(difflib.SequenceMatcher(None, key, matches[0]).ratio(), 3)
+
+    def pop_new_aliases(self):
+        new_aliases, self.new_aliases = self.new_aliases, []
+        return new_aliases
+
+    def report(self):
+        """Prints the names matched fuzzily (worth a review) and the ones that became new banks."""
+        for raw_name, key, score in sorted(self.fuzzy_matches, key=lambda match: match[2]):
+            print(f"Fuzzy bank match ({score:.3f}): {raw_name!r} -> {key!r}")
+        if not self.seeded:
+            # First load: every bank is new, so there is nothing to flag
+            print(f"{len(self.new_banks)} banks added")
+            return
+        for raw_name in sorted(self.new_banks, key=str):
+            print(f"Unresolved bank name, added as a new bank: {raw_name!r}")
@@ -0,0 +1,266 @@
+"""
+Route-level benchmark: generates synthetic neft_<month>_<year> tables, loads them
+into SQLite (or any DATABASE_URL) and times each route through the Flask test
+client, splitting every request into SQL, plot, template and remaining time.
+
+    python benchmark.py --banks 200 --months 96 --iterations 20 --output bench.json
+    python benchmark.py --layout fact --compare bench.json
+"""
+
+import os
+import json
+import time
+import argparse
+import calendar
+import tempfile
+import platform
+import threading
+import numpy as np
+import pandas as pd
+from urllib.parse import urlencode
+from sqlalchemy import create_engine, event, text
+from flask import before_render_template, template_rendered
+from fileconverter import neft_headers, to_fact_rows, MetricSchema, rollup_select, cumulative_select
+
+schema = MetricSchema("NEFT")
+
+
+# --- Synthetic data ---
+def generate_months(banks, months, start_year=2016, seed=0):
+    """
+    Yields (year, month, df) with the columns fileconverter.py writes for the
+    month tables. Bank sizes follow a Zipf-like power law (a few banks carry most
+    of the volume), volumes grow month over month with a year-end bump, and
+    amounts scale with counts with a per-bank average ticket size.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"Synthetic Bank {i:04d} Ltd" for i in range(banks)]
+    weight = 1.0 / np.arange(1, banks + 1) ** 1.1
+    ticket = rng.lognormal(mean=10, sigma=0.8, size=banks)
+    base_volume = 5e8
+    for i in range(months):
+        year, month = start_year + i // 12, i % 12 + 1
+        growth = 1.02 ** i * (1.15 if month == 3 else 1.0)  # March is fiscal year end
+        active = rng.random(banks) > 0.02  # a few banks don't report each month
+        outward = rng.poisson(np.maximum(base_volume * growth * weight * rng.lognormal(0, 0.1, banks), 1))
+        inward = rng.poisson(np.maximum(outward * rng.uniform(0.8, 1.2, banks), 1))
+        df = pd.DataFrame({
+            'Sr. No': np.arange(1, banks + 1),
+            'Bank Name': names,
+            'No. Of Outward Transactions': outward,
+            'Amount(Outward)': np.round(outward * ticket / 1e5, 2),  # Rs lakh
+            'No. Of Inward Transactions': inward,
+            'Amount(Inward)': np.round(inward * ticket / 1e5, 2),
+        })[active]
+        yield year, month, df[neft_headers].reset_index(drop=True)
+
+
+def load_database(database_url, frames, layout):
+    """
+    Writes the month tables (layout 'legacy') or the fact, bank, rollup, prefix-sum
+    and dimension tables (layout 'fact') using fileconverter's table and column names.
+    """
+    engine = create_engine(database_url)
+    fact_table, bank_dimension = schema.fact_table, schema.bank_dimension
+    fact_frames = []
+    with engine.begin() as connection:
+        for year, month, df in frames:
+            if layout == 'legacy':
+                df.to_sql(f"neft_{calendar.month_name[month].lower()}_{year}", con=connection, if_exists='replace', index=False, chunksize=1000)
+            else:
+                fact_frames.append(to_fact_rows(df, year, month))
+        if layout == 'fact':
+            fact_df = pd.concat(fact_frames)
+            banks = pd.DataFrame({'Bank Name': sorted(fact_df['Bank Name'].unique())})
+            banks.insert(0, 'bank_id', range(1, len(banks) + 1))
+            banks.to_sql(bank_dimension, con=connection, if_exists='replace', index=False)
+            fact_df.insert(0, 'bank_id', fact_df['Bank Name'].map(dict(zip(banks['Bank Name'], banks['bank_id']))))
+            fact_df.drop(columns=['Bank Name']).to_sql(fact_table, con=connection, if_exists='replace', index=False, chunksize=1000)
+            connection.execute(text(f"CREATE UNIQUE INDEX uq_bank_name ON `{bank_dimension}` (`Bank Name`)"))
+            connection.execute(text(f"CREATE INDEX idx_year_month ON `{fact_table}` (`Year`, `Month`)"))
+            connection.execute(text(f"CREATE INDEX idx_bank_id ON `{fact_table}` (`bank_id`, `Year`, `Month`)"))
+            # Portable CREATE TABLE ... AS SELECT stand-ins for fileconverter's MySQL rollup DDL
+            for table_name, (group_cols, _) in schema.rollup_tables.items():
+                connection.execute(text(f"CREATE TABLE `{table_name}` AS {rollup_select(group_cols, fact_table, bank_dimension)}"))
+            connection.execute(text(f"CREATE INDEX idx_period_bank ON `{schema.metric.lower()}_rollup_bank_monthly` (`Year` DESC, `Month` DESC, `Bank Name`)"))
+            for table_name, (source_table, partition_cols, _) in schema.cumulative_tables.items():
+                connection.execute(text(f"CREATE TABLE `{table_name}` AS {cumulative_select(partition_cols, source_table)}"))
+            for table_name, (cols, _) in schema.dimension_tables.items():
+                connection.execute(text(f"CREATE TABLE `{table_name}` AS SELECT DISTINCT {', '.join(cols)} FROM `{fact_table}`"))
+    engine.dispose()
+
+
+# --- Per-request timing ---
+class RequestTimer:
+    """Accumulates SQL, plot and template time for the request being measured."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.sql = self.plot = self.template = 0.0
+        self.queries = 0
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.query_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.sql += time.perf_counter() - self._local.query_start
+        self.queries += 1
+
+    def before_render(self, sender, template, context, **extra):
+        self._local.template_start = time.perf_counter()
+
+    def rendered(self, sender, template, context, **extra):
+        start = getattr(self._local, 'template_start', None)
+        if start is not None:
+            self.template += time.perf_counter() - start
+            self._local.template_start = None
+
+    def wrap_render(self, render):
+        """Times a chart render callable, excluding the SQL it runs."""
+        def timed():
+            start, sql_before = time.perf_counter(), self.sql
+            try:
+                return render()
+            finally:
+                self.plot += (time.perf_counter() - start) - (self.sql - sql_before)
+        return timed
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else None
+
+
+def summarize(samples):
+    """p50/p95 (ms) for every timed component of a route's samples."""
+    summary = {}
+    for part in ('total', 'sql', 'plot', 'template', 'other'):
+        values = [sample[part] for sample in samples]
+        summary[part] = {'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95)}
+    summary['queries'] = int(np.median([sample['queries'] for sample in samples]))
+    summary['status'] = samples[-1]['status']
+    summary['bytes'] = samples[-1]['bytes']
+    return summary
+
+
+def benchmark_routes(app_module, routes, iterations, warm_cache):
+    """Times every route through the test client; returns {route: summary}."""
+    flask_app = app_module.app
+    timer = RequestTimer()
+    with flask_app.app_context():
+        event.listen(app_module.db.engine, 'before_cursor_execute', timer.before_cursor_execute)
+        event.listen(app_module.db.engine, 'after_cursor_execute', timer.after_cursor_execute)
+    before_render_template.connect(timer.before_render, flask_app)
+    template_rendered.connect(timer.rendered, flask_app)
+    chart_cache = app_module.chart_cache
+    get_or_render = chart_cache.get_or_render
+    chart_cache.get_or_render = lambda key, render: get_or_render(key, timer.wrap_render(render))
+
+    client = flask_app.test_client()
+    results = {}
+    for route in routes:
+        samples = []
+        for i in range(iterations + 1):  # the first request is a discarded warm-up
+            if not warm_cache:
+                chart_cache.clear()
+                app_module.catalog.invalidate()
+                app_module.load_filter_dimensions.cache_clear()
+            timer.reset()
+            start = time.perf_counter()
+            response = client.get(route)
+            body = response.get_data()  # drains streamed responses
+            total = time.perf_counter() - start
+            if i == 0:
+                continue
+            samples.append({
+                'total': total, 'sql': timer.sql, 'plot': timer.plot, 'template': timer.template,
+                'other': max(total - timer.sql - timer.plot - timer.template, 0.0),
+                'queries': timer.queries, 'status': response.status_code, 'bytes': len(body),
+            })
+        results[route] = summarize(samples)
+        total = results[route]['total']
+        print(f"{route:<60} {results[route]['status']}  p50 {total['p50_ms']:8.1f} ms  p95 {total['p95_ms']:8.1f} ms  "
+              f"sql {results[route]['sql']['p50_ms']:7.1f}  plot {results[route]['plot']['p50_ms']:7.1f}  "
+              f"template {results[route]['template']['p50_ms']:7.1f}")
+    return results
+
+
+def default_routes(sample_bank, sample_year):
+    bank_query = urlencode({'bank_name': sample_bank})
+    return [
+        '/',
+        '/filters',
+        '/transactions',
+        f"/transactions?{urlencode({'year': sample_year})}",
+        f"/transactions?{bank_query}",
+        '/transactions?stream=1',
+        f"/transactions/graph.png?{bank_query}",
+        '/graph1', '/graph1.png',
+        '/graph2', '/graph2.png',
+        '/graph3', '/graph3.png',
+        '/graph4', '/graph4.png',
+    ]
+
+
+def compare(results, baseline_path):
+    """Prints p50/p95 of each route relative to a previous JSON report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['routes']
+    print(f"\nCompared with {baseline_path} (ratio < 1.0 is faster):")
+    for route, summary in results.items():
+        if route not in baseline:
+            continue
+        old = baseline[route]['total']
+        ratios = [summary['total'][q] / old[q] if old[q] else float('nan') for q in ('p50_ms', 'p95_ms')]
+        print(f"{route:<60} p50 x{ratios[0]:.2f}  p95 x{ratios[1]:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flask routes against synthetic NEFT data.")
+    parser.add_argument("--banks", type=int, default=150, help="banks per month")
+    parser.add_argument("--months", type=int, default=96, help="months of history, starting January --start-year")
+    parser.add_argument("--start-year", type=int, default=2016)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layout", choices=["legacy", "fact"], default="legacy",
+                        help="per-month tables only, or the fact table with rollups and dimensions")
+    parser.add_argument("--backend", choices=["sql", "memory"], default="sql", help="app NEFT_BACKEND")
+    parser.add_argument("--database-url", help="load into this database instead of a temporary SQLite file")
+    parser.add_argument("--iterations", type=int, default=10, help="timed requests per route")
+    parser.add_argument("--warm-cache", action="store_true", help="keep chart and catalog caches between requests")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--compare", help="JSON report from an earlier run to compare against")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="neft_bench_")
+    database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'neft.db')}"
+    frames = list(generate_months(args.banks, args.months, args.start_year, args.seed))
+    start = time.perf_counter()
+    load_database(database_url, frames, args.layout)
+    print(f"Loaded {sum(len(df) for _, _, df in frames)} rows ({args.months} months x {args.banks} banks, {args.layout}) in {time.perf_counter() - start:.1f}s")
+
+    # app.py reads its configuration from the environment at import time
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['NEFT_BACKEND'] = args.backend
+    os.environ['CHART_CACHE_DIR'] = os.path.join(work_dir, 'chart_cache')
+    os.environ['NEFT_SNAPSHOT_DIR'] = os.path.join(work_dir, 'snapshot')
+    import app as app_module
+
+    sample_bank = frames[-1][2]['Bank Name'].iloc[0]
+    results = benchmark_routes(app_module, default_routes(sample_bank, frames[-1][0]), args.iterations, args.warm_cache)
+
+    report = {
+        'config': dict(vars(args), database_url=database_url.split('@')[-1], python=platform.python_version(), created=time.time()),
+        'routes': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
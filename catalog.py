@@ -0,0 +1,93 @@
+import time
+import hashlib
+import threading
+from sqlalchemy import text, inspect as sql_inspect
+
+# Single-row table written by fileconverter.py; version goes up by one per ingest
+VERSION_TABLE = "neft_data_version"
+
+
+class CatalogCache:
+    """
+    Cached set of table names plus the data version they belong to.
+
+    The version is polled at most once every ttl seconds with a primary key
+    lookup on version_table, and the table names are only re-inspected when it
+    changes. Databases loaded before version_table existed fall back to a
+    fingerprint of the table catalog. Other caches should key on version().
+    """
+
+    def __init__(self, engine_getter, ttl=10, version_table=VERSION_TABLE):
+        self.engine_getter = engine_getter
+        self.ttl = ttl
+        self.version_table = version_table
+        self._lock = threading.Lock()
+        self._version = None
+        self._table_names = frozenset()
+        self._checked_at = None
+        self.stats = {'polls': 0, 'reloads': 0}
+
+    def version(self):
+        self._refresh()
+        return self._version
+
+    def table_names(self):
+        self._refresh()
+        return self._table_names
+
+    def invalidate(self):
+        """Forces the next call to poll the version and reload the table names."""
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, version=self._version, tables=len(self._table_names))
+
+    def _refresh(self):
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl:
+                return
+            engine = self.engine_getter()
+            self.stats['polls'] += 1
+            version = self._read_version(engine)
+            if version is None or version != self._version:
+                table_names = self._read_table_names(engine)
+                if version is None:
+                    version = self._catalog_fingerprint(engine, table_names)
+                if version != self._version:
+                    self.stats['reloads'] += 1
+                self._table_names = table_names
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def _read_version(self, engine):
+        try:
+            with engine.connect() as connection:
+                version = connection.execute(text(f"SELECT `version` FROM `{self.version_table}` WHERE `id` = 1")).scalar()
+            return None if version is None else f"v{version}"
+        except Exception:
+            return None  # No version table yet
+
+    def _read_table_names(self, engine):
+        try:
+            return frozenset(sql_inspect(engine).get_table_names())
+        except Exception as e:
+            print(f"Error inspecting database tables: {e}")
+            return frozenset()
+
+    def _catalog_fingerprint(self, engine, table_names):
+        """Table names plus creation times where the database reports them."""
+        catalog = sorted(table_names)
+        try:
+            if engine.dialect.name == 'mysql':
+                with engine.connect() as connection:
+                    rows = connection.execute(text(
+                        "SELECT TABLE_NAME, CREATE_TIME FROM information_schema.TABLES "
+                        "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME"
+                    )).all()
+                catalog = [f"{name}@{created}" for name, created in rows]
+        except Exception as e:
+            print(f"Error reading table creation times, using table names only: {e}")
+        return "c" + hashlib.sha1("|".join(catalog).encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,108 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ChartCache:
+    """
+    Bounded LRU cache for rendered chart images. Entries live in memory and are
+    mirrored to disk, so a restarted process can serve charts without replotting.
+    Keys should include a data version so new ingests never serve stale charts.
+    With a namespace (e.g. the metric) the files go in cache_dir/<namespace>, so
+    processes serving different data can share one cache_dir.
+    """
+
+    def __init__(self, cache_dir, max_entries=64, max_disk_entries=512, namespace=None):
+        self.cache_dir = os.path.join(cache_dir, namespace) if namespace else cache_dir
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(route, params, data_version):
+        """Stable key from the route name, normalized filter params and data version."""
+        normalized = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        return hashlib.sha1(f"{route}|{normalized}|{data_version}".encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.chart")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Touch so disk eviction stays least-recently-used
+        except OSError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        with self._lock:
+            self.stats['disk_hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except OSError as e:
+            print(f"Error writing chart cache file {path}: {e}")
+
+    def get_or_render(self, key, render):
+        """Returns the cached image for key, calling render() and storing its bytes on a miss."""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            if data is not None:
+                self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.chart'):
+                os.remove(entry.path)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries)
+
+    def _remember(self, key, data):
+        # Caller holds self._lock
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _trim_disk(self):
+        files = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.chart')]
+        excess = len(files) - self.max_disk_entries
+        if excess <= 0:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:excess]:
+            try:
+                os.remove(entry.path)
+                with self._lock:
+                    self.stats['disk_evictions'] += 1
+            except OSError:
+                pass
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = ['outward_count', 'outward_amount', 'inward_count', 'inward_amount']
+
+
+class ColumnarStore:
+    """
+    In-memory NEFT backend: the fact rows as NumPy columns with bank names
+    dictionary-encoded to integer codes (codes follow sorted name order).
+
+    Rows are kept sorted by (bank code, period), so each bank is one contiguous
+    row group. A second index, display_order, lists rows by (period DESC, bank
+    code), so each (year, month) is also one contiguous range. Filters resolve to
+    slices of these arrays; aggregations are np.bincount over the codes.
+    """
+
+    def __init__(self, bank_names, bank_codes, years, months, metrics):
+        self.bank_names = list(bank_names)
+        self._bank_lookup = {name: code for code, name in enumerate(self.bank_names)}
+        n_banks = len(self.bank_names)
+
+        period_keys = years.astype(np.int32) * 12 + (months.astype(np.int32) - 1)
+        self.period_keys = np.unique(period_keys)  # sorted ascending, one per (year, month)
+        period_codes = np.searchsorted(self.period_keys, period_keys).astype(np.int32)
+        n_periods = len(self.period_keys)
+
+        order = np.lexsort((period_codes, bank_codes))
+        self.bank_codes = np.ascontiguousarray(bank_codes[order])
+        self.period_codes = np.ascontiguousarray(period_codes[order])
+        self.columns = {name: np.ascontiguousarray(values[order]) for name, values in metrics.items()}
+        self.bank_offsets = np.searchsorted(self.bank_codes, np.arange(n_banks + 1))
+
+        # Display order: newest period first, banks ascending within a period
+        display_keys = (n_periods - 1 - self.period_codes).astype(np.int64) * max(n_banks, 1) + self.bank_codes
+        self.display_order = np.argsort(display_keys, kind='stable')
+        self.display_keys = display_keys[self.display_order]
+        self.period_offsets = np.searchsorted(
+            self.display_keys, np.arange(n_periods + 1, dtype=np.int64) * max(n_banks, 1)
+        )  # period offsets in display order, indexed by (n_periods - 1 - period code)
+
+        # Prefix sums: row_prefix[col][i] is the sum of rows before i (a bank's rows are
+        # contiguous and period ordered), period_prefix[col][c] the sum of periods before c
+        self.row_prefix = {name: np.concatenate(([0], np.cumsum(values))) for name, values in self.columns.items()}
+        self.period_prefix = {
+            name: np.concatenate(([0], np.cumsum(np.bincount(self.period_codes, weights=values, minlength=n_periods))))
+            for name, values in self.columns.items()
+        }
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds the store from a DataFrame using the pandas-variant / snapshot column names."""
+        banks = df['bank_name']
+        if not isinstance(banks.dtype, pd.CategoricalDtype):
+            banks = banks.astype(str).astype('category')
+        categories = banks.cat.categories
+        # Re-code so that code order matches sorted bank name order
+        sorted_names = sorted(str(name) for name in categories)
+        recode = np.searchsorted(np.array(sorted_names, dtype=object), np.array([str(c) for c in categories], dtype=object))
+        bank_codes = recode[banks.cat.codes.to_numpy()].astype(np.int32)
+        metrics = {col: pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(
+                       dtype=np.int64 if col.endswith('_count') else np.float64)
+                   for col in METRIC_COLUMNS}
+        return cls(sorted_names, bank_codes, df['year'].to_numpy(), df['month'].to_numpy(), metrics)
+
+    # --- Helpers ---
+    def has_data(self):
+        return len(self.bank_codes) > 0
+
+    def _period(self, period_code):
+        key = int(self.period_keys[period_code])
+        return key // 12, key % 12 + 1
+
+    def _matching_period_codes(self, filters):
+        years = self.period_keys // 12
+        months = self.period_keys % 12 + 1
+        mask = np.ones(len(self.period_keys), dtype=bool)
+        if 'year' in filters: mask &= years == filters['year']
+        if 'month' in filters: mask &= months == filters['month']
+        return np.flatnonzero(mask)
+
+    def _rows(self, filters):
+        """Row positions matching the filters, as a slice where possible (zero copy)."""
+        if 'bank_name' in filters:
+            code = self._bank_lookup.get(filters['bank_name'])
+            if code is None:
+                return slice(0, 0)
+            start, end = self.bank_offsets[code], self.bank_offsets[code + 1]
+            if 'year' not in filters and 'month' not in filters:
+                return slice(start, end)
+            codes = self._matching_period_codes(filters)
+            if len(codes) == 0:
+                return slice(0, 0)
+            # Periods are sorted inside a bank's row group, so a contiguous year is one sub-slice
+            if 'month' not in filters or 'year' in filters:
+                lo = start + np.searchsorted(self.period_codes[start:end], codes[0], side='left')
+                hi = start + np.searchsorted(self.period_codes[start:end], codes[-1], side='right')
+                return slice(lo, hi)
+            group = self.period_codes[start:end]
+            return start + np.flatnonzero(np.isin(group, codes))
+        if 'year' in filters or 'month' in filters:
+            return self._display_rows(filters)
+        return slice(0, len(self.bank_codes))
+
+    def _display_rows(self, filters):
+        """Row positions in display order (Year DESC, Month DESC, Bank ASC) matching the filters."""
+        n_periods = len(self.period_keys)
+        if 'bank_name' in filters:
+            rows = self._rows(filters)
+            positions = np.arange(rows.start, rows.stop) if isinstance(rows, slice) else rows
+            return positions[::-1]  # Bank group is period ascending
+        if 'year' not in filters and 'month' not in filters:
+            return self.display_order
+        ranges = [
+            self.display_order[self.period_offsets[n_periods - 1 - code]:self.period_offsets[n_periods - code]]
+            for code in self._matching_period_codes(filters)[::-1]
+        ]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def _display_row(self, pos):
+        year, month = self._period(self.period_codes[pos])
+        return {
+            'bank_name': self.bank_names[self.bank_codes[pos]],
+            'year': year,
+            'month': month,
+            'outward_count': int(self.columns['outward_count'][pos]),
+            'outward_amount': float(self.columns['outward_amount'][pos]),
+            'inward_count': int(self.columns['inward_count'][pos]),
+            'inward_amount': float(self.columns['inward_amount'][pos]),
+        }
+
+    def _totals(self, metric, rows):
+        if metric == 'count':
+            return self.columns['inward_count'][rows] + self.columns['outward_count'][rows]
+        return self.columns['inward_amount'][rows] + self.columns['outward_amount'][rows]
+
+    # --- Backend interface (same as app.SqlBackend) ---
+    def monthly_series(self, filters):
+        """[(year, month, total count, total amount)] ascending by period, for the normalized filters."""
+        rows = self._rows(filters)
+        n_periods = len(self.period_keys)
+        period_codes = self.period_codes[rows]
+        counts = np.bincount(period_codes, weights=self._totals('count', rows), minlength=n_periods)
+        amounts = np.bincount(period_codes, weights=self._totals('amount', rows), minlength=n_periods)
+        return [(*self._period(code), int(counts[code]), float(amounts[code])) for code in np.unique(period_codes)]
+
+    def monthly_totals(self):
+        """[(year, month, total count, total amount)] ascending by period."""
+        return self.monthly_series({})
+
+    def _rank_banks(self, metric, rows, limit):
+        """(top bank codes, per-bank totals, codes of every bank present) over rows; ties go to the earlier name."""
+        bank_codes = self.bank_codes[rows]
+        totals = np.bincount(bank_codes, weights=self._totals(metric, rows), minlength=len(self.bank_names))
+        present = np.unique(bank_codes)
+        return present[np.argsort(-totals[present], kind='stable')][:limit], totals, present
+
+    def top_banks(self, metric, limit=10, filters=None):
+        """[(bank name, total)] for the limit banks with the largest count or amount total."""
+        top, totals, _ = self._rank_banks(metric, self._rows(filters or {}), limit)
+        cast = int if metric == 'count' else float
+        return [(self.bank_names[code], cast(totals[code])) for code in top]
+
+    def top_banks_window(self, metric, start=None, end=None, limit=10):
+        """
+        ([(bank name, total)], others total, others bank count) for the limit banks with
+        the largest count or amount total from start to end ((year, month), inclusive;
+        None for open ended), plus the sum over every other bank in the window.
+        """
+        lo = 0 if start is None else np.searchsorted(self.period_keys, start[0] * 12 + start[1] - 1, side='left')
+        hi = len(self.period_keys) if end is None else np.searchsorted(self.period_keys, end[0] * 12 + end[1] - 1, side='right')
+        rows = np.flatnonzero((self.period_codes >= lo) & (self.period_codes < hi))
+        top, totals, present = self._rank_banks(metric, rows, limit)
+        cast = int if metric == 'count' else float
+        others_total = totals[present].sum() - totals[top].sum()
+        return [(self.bank_names[code], cast(totals[code])) for code in top], cast(others_total), len(present) - len(top)
+
+    def range_totals(self, windows, bank_name=None):
+        """
+        [{metric column: total}] for each (start, end) window of (year, month) pairs
+        (inclusive; None for open ended), for one bank or for all banks: a difference
+        of two prefix sums found by binary search.
+        """
+        results = []
+        for start, end in windows:
+            code_lo = 0 if start is None else int(np.searchsorted(self.period_keys, start[0] * 12 + start[1] - 1, side='left'))
+            code_hi = len(self.period_keys) if end is None else int(np.searchsorted(self.period_keys, end[0] * 12 + end[1] - 1, side='right'))
+            if bank_name is None:
+                prefix, lo, hi = self.period_prefix, code_lo, max(code_hi, code_lo)
+            else:
+                code = self._bank_lookup.get(bank_name)
+                first, last = (self.bank_offsets[code], self.bank_offsets[code + 1]) if code is not None else (0, 0)
+                group = self.period_codes[first:last]
+                lo = first + int(np.searchsorted(group, code_lo, side='left'))
+                hi = max(first + int(np.searchsorted(group, code_hi, side='left')), lo)
+                prefix = self.row_prefix
+            results.append({
+                name: (int(round(prefix[name][hi] - prefix[name][lo])) if name.endswith('_count') else float(prefix[name][hi] - prefix[name][lo]))
+                for name in METRIC_COLUMNS
+            })
+        return results
+
+    def bank_monthly_counts(self, filters):
+        """[(year, month, total count)] ascending by period for the filtered bank."""
+        return [(year, month, count) for year, month, count, _ in self.monthly_series(filters)]
+
+    def filter_dimensions(self):
+        return tuple(self.bank_names), tuple(self._period(code) for code in range(len(self.period_keys)))
+
+    def transactions_page(self, filters, cursor=None, limit=100):
+        """Display rows after the keyset cursor, ordered Year DESC, Month DESC, Bank ASC."""
+        positions = self._display_rows(filters)
+        if cursor:
+            n_banks = max(len(self.bank_names), 1)
+            cursor_key = cursor['cursor_year'] * 12 + cursor['cursor_month'] - 1
+            # Rows strictly after the cursor: older periods, or same period with a later bank name
+            newer_periods = np.searchsorted(self.period_keys, cursor_key, side='right')
+            if newer_periods and self.period_keys[newer_periods - 1] == cursor_key:
+                bank_rank = int(np.searchsorted(np.array(self.bank_names, dtype=object), cursor['cursor_bank'], side='right'))
+                boundary = (len(self.period_keys) - newer_periods) * n_banks + bank_rank
+            else:
+                boundary = (len(self.period_keys) - newer_periods) * n_banks
+            keys = (len(self.period_keys) - 1 - self.period_codes[positions]).astype(np.int64) * n_banks + self.bank_codes[positions]
+            positions = positions[np.searchsorted(keys, boundary, side='left'):]
+        return [self._display_row(pos) for pos in positions[:limit]]
+
+    def iter_transactions(self, filters):
+        for pos in self._display_rows(filters):
+            yield self._display_row(pos)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Responses worth retrying (throttling and transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_session(user_agent, cookies=()):
+    """
+    requests.Session sending user_agent and carrying cookies (as saved from
+    Selenium's get_cookies()), shared by the listing fetch and the downloads.
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = user_agent
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    return session
+
+
+class Downloader:
+    """
+    Concurrent, resumable workbook downloader. Fetches (url, path) jobs through a
+    pooled requests.Session (see make_session) on a bounded thread pool, retrying transient failures
+    with exponential backoff.
+
+    A JSON state file next to the downloads records each file's size, mtime, sha256
+    and the server's ETag / Last-Modified. Files that still match their record are
+    revalidated with a conditional GET (or skipped when the server sent no
+    validators), and every download is written to a .part file then renamed into
+    place, so an interrupted run never leaves a truncated workbook behind.
+    """
+
+    def __init__(self, state_path, workers=4, max_retries=4, backoff=1.0, timeout=60, session=None):
+        self.state_path = state_path
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self.state = self._read_state()
+
+    def _read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        with self._lock:
+            state = dict(self.state)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _record(self, path, entry):
+        with self._lock:
+            self.state[os.path.abspath(path)] = entry
+
+    def _local_entry(self, url, path):
+        """
+        The state entry for path if the file on disk still matches it, else None.
+        Size and mtime are compared first; the file is only hashed when the size
+        matches but the mtime doesn't, and a matching hash refreshes the mtime.
+        """
+        with self._lock:
+            entry = self.state.get(os.path.abspath(path))
+        if not entry or entry.get('url') != url or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if stat.st_size != entry.get('size'):
+            return None
+        if entry.get('mtime') is not None and abs(entry['mtime'] - stat.st_mtime) < 1e-6:
+            return entry
+        if file_sha256(path) != entry.get('sha256'):
+            return None
+        entry = dict(entry, mtime=stat.st_mtime)
+        self._record(path, entry)
+        return entry
+
+    def _request(self, method, url, **kwargs):
+        """Sends a request, retrying connection errors and RETRY_STATUSES with backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+            time.sleep(delay + random.uniform(0, self.backoff / 2))
+
+    def fetch(self, url, path):
+        """
+        Downloads url to path. Returns (status, bytes written) where status is
+        'downloaded', 'not_modified' or 'skipped'. Raises on failure.
+        """
+        entry = self._local_entry(url, path)
+        headers = {}
+        if entry is None and os.path.exists(path):
+            # Present but unknown to the state file: keep it if the server reports the same size
+            response = self._request('HEAD', url, allow_redirects=True)
+            size = response.headers.get('Content-Length')
+            if response.ok and size is not None and int(size) == os.path.getsize(path):
+                self._record(path, {
+                    'url': url, 'size': int(size), 'mtime': os.path.getmtime(path), 'sha256': file_sha256(path),
+                    'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                })
+                return 'skipped', 0
+        elif entry is not None:
+            if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+            if not headers:
+                return 'skipped', 0
+
+        response = self._request('GET', url, headers=headers, stream=True)
+        with response:
+            if response.status_code == 304:
+                return 'not_modified', 0
+            response.raise_for_status()
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.part"
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                expected = response.headers.get('Content-Length')
+                if expected is not None and 'Content-Encoding' not in response.headers and int(expected) != size:
+                    raise IOError(f"Incomplete download: got {size} of {expected} bytes")
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        self._record(path, {
+            'url': url, 'size': size, 'mtime': os.path.getmtime(path), 'sha256': digest.hexdigest(),
+            'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+        })
+        return 'downloaded', size
+
+    def download_all(self, jobs):
+        """
+        Fetches every (url, path) job concurrently. Returns {path: (status, detail)};
+        failures are reported with status 'failed' and the error text instead of raising.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.fetch, url, path): (url, path) for url, path in jobs}
+            for future in as_completed(futures):
+                url, path = futures[future]
+                try:
+                    status, size = future.result()
+                    results[path] = (status, size)
+                    print(f"{status:<12} {path} ({size} bytes)" if status == 'downloaded' else f"{status:<12} {path}")
+                except Exception as e:
+                    results[path] = ('failed', str(e))
+                    print(f"Error downloading {url}: {e}")
+        self.save_state()
+        return results
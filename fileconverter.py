@@ -1,82 +1,1000 @@
 import os
+import csv
+import time
+import argparse
+import calendar
+import hashlib
 import pandas as pd
 import pymysql
 import sqlalchemy
+from sqlalchemy import text
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import snapshot
+from bank_identity import BankResolver, normalize_name
 
 
 root = "RBI_Data"
 supported_formats = ["XLS","XLSX"]
-metric = "NEFT"
 neft_headers = ['Sr. No','Bank Name','No. Of Outward Transactions','Amount(Outward)','No. Of Inward Transactions','Amount(Inward)']
+count_headers = ['No. Of Outward Transactions','No. Of Inward Transactions']
+amount_headers = ['Amount(Outward)','Amount(Inward)']
+month_lookup = {name.lower(): num for num, name in enumerate(calendar.month_name) if num}
+
+# RTGS sheets split each direction into interbank and customer transactions
+rtgs_headers = ['Sr. No','Bank Name',
+                'Inward Interbank No.','Inward Interbank Amount','Inward Customer No.','Inward Customer Amount',
+                'Outward Interbank No.','Outward Interbank Amount','Outward Customer No.','Outward Customer Amount']
+
+# Sheets read from every workbook, by metric: the sheet name, its data columns in
+# order, and the workbook columns summed into each of the stored (neft_headers)
+# columns. Every metric is stored with the same columns, in its own database
+metric_specs = {
+    "NEFT": {'sheet': "NEFT", 'headers': neft_headers, 'columns': {col: [col] for col in neft_headers}},
+    "RTGS": {'sheet': "RTGS", 'headers': rtgs_headers, 'columns': {
+        'Sr. No': ['Sr. No'],
+        'Bank Name': ['Bank Name'],
+        'No. Of Outward Transactions': ['Outward Interbank No.', 'Outward Customer No.'],
+        'Amount(Outward)': ['Outward Interbank Amount', 'Outward Customer Amount'],
+        'No. Of Inward Transactions': ['Inward Interbank No.', 'Inward Customer No.'],
+        'Amount(Inward)': ['Inward Interbank Amount', 'Inward Customer Amount'],
+    }},
+}
+
+# Column types of every table ingestion creates (nothing is left to pandas' type
+# inference): exact counts, fixed-precision amounts in Rs lakh, and a small
+# integer bank_id standing in for the bank name outside the month tables
+count_type = "BIGINT"
+amount_type = "DECIMAL(20,2)"
+bank_id_type = "SMALLINT UNSIGNED"
+bank_name_type = "VARCHAR(255) COLLATE utf8mb4_bin"
+metric_columns_ddl = ",\n        ".join(
+    f"`{col}` {count_type if col in count_headers else amount_type}"
+    for col in neft_headers if col in count_headers + amount_headers
+)
+
+
+def month_table_ddl(table_name):
+    """CREATE TABLE statement for one month's table: the workbook's columns, typed."""
+    return f"""
+    CREATE TABLE `{table_name}` (
+        `Sr. No` INT,
+        `Bank Name` {bank_name_type},
+        {metric_columns_ddl}
+    )
+    """
+
+
+def fact_table_ddl(table_name, years):
+    """
+    CREATE TABLE statement for the consolidated fact table, range partitioned
+    by Year (one partition per loaded year) and indexed for the app's filters.
+
+    bank_id refers to the bank dimension; the reference isn't declared as a FOREIGN
+    KEY because partitioned InnoDB tables don't support them.
+    """
+    partitions = ",\n        ".join(
+        [f"PARTITION p{y} VALUES LESS THAN ({y + 1})" for y in sorted(years)]
+        + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+    )
+    return f"""
+    CREATE TABLE `{table_name}` (
+        `bank_id` {bank_id_type} NOT NULL,
+        {metric_columns_ddl},
+        `Year` SMALLINT NOT NULL,
+        `Month` TINYINT NOT NULL,
+        KEY `idx_year_month` (`Year`, `Month`),
+        KEY `idx_bank_id` (`bank_id`, `Year`, `Month`)
+    )
+    PARTITION BY RANGE (`Year`) (
+        {partitions}
+    )
+    """
+
+
+def swap_in_table(connection, table_name, staging_name):
+    """
+    Replaces table_name with the freshly built staging_name in one RENAME TABLE,
+    so the app never sees the table missing or half loaded.
+    """
+    if sqlalchemy.inspect(connection).has_table(table_name):
+        connection.execute(text(f"DROP TABLE IF EXISTS `old_{table_name}`"))
+        connection.execute(text(f"RENAME TABLE `{table_name}` TO `old_{table_name}`, `{staging_name}` TO `{table_name}`"))
+        connection.execute(text(f"DROP TABLE `old_{table_name}`"))
+    else:
+        connection.execute(text(f"RENAME TABLE `{staging_name}` TO `{table_name}`"))
+
+
+def ensure_fact_table(connection, schema, years):
+    """Creates the fact table if missing, otherwise splits pmax so every newer year gets its own partition."""
+    fact_table = schema.fact_table
+    if not sqlalchemy.inspect(connection).has_table(fact_table):
+        connection.execute(text(fact_table_ddl(fact_table, years)))
+        return
+    partitions = connection.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+    ), {'table_name': fact_table}).scalars().all()
+    max_year = max((int(name[1:]) for name in partitions if name and name[1:].isdigit()), default=0)
+    for year in sorted(years):
+        if year > max_year:
+            connection.execute(text(
+                f"ALTER TABLE `{fact_table}` REORGANIZE PARTITION pmax INTO ("
+                f"PARTITION p{year} VALUES LESS THAN ({year + 1}), "
+                f"PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            ))
+            max_year = year
+
+
+def table_columns(connection, table_name):
+    return {column['name'] for column in sqlalchemy.inspect(connection).get_columns(table_name)}
+
+
+def ensure_bank_dimension(connection, schema):
+    connection.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS `{schema.bank_dimension}` (
+        `bank_id` {bank_id_type} NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        `Bank Name` {bank_name_type} NOT NULL,
+        UNIQUE KEY `uq_bank_name` (`Bank Name`)
+    )
+    """))
+
+
+def ensure_bank_aliases(connection, schema):
+    connection.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS `{schema.bank_alias_table}` (
+        `alias_key` {bank_name_type} NOT NULL PRIMARY KEY,
+        `raw_name` {bank_name_type} NOT NULL,
+        `bank_id` {bank_id_type} NOT NULL,
+        `method` VARCHAR(16) NOT NULL,
+        `score` DOUBLE NULL,
+        `created_at` DATETIME NOT NULL,
+        KEY `idx_bank_id` (`bank_id`)
+    )
+    """))
+
+
+def save_aliases(connection, schema, aliases):
+    """Persists (key, raw name, bank_id, method, score) tuples; keys already stored are left alone."""
+    if aliases:
+        connection.execute(text(
+            f"INSERT IGNORE INTO `{schema.bank_alias_table}` (`alias_key`, `raw_name`, `bank_id`, `method`, `score`, `created_at`) "
+            f"VALUES (:alias_key, :raw_name, :bank_id, :method, :score, NOW())"
+        ), [{'alias_key': key, 'raw_name': str(raw_name).strip(), 'bank_id': bank_id, 'method': method, 'score': score}
+            for key, raw_name, bank_id, method, score in aliases])
+
+
+def merge_banks(connection, schema, from_id, to_id):
+    """
+    Moves every fact row and alias of bank from_id onto to_id and drops from_id
+    from the bank dimension. In months both banks have a fact row, from_id's
+    counts and amounts are added into to_id's row and its own row is deleted, so
+    the fact table keeps one row per (bank_id, Year, Month). The rollups are
+    left to the caller to rebuild (load_bank_resolver reports the merge).
+    """
+    params = {'from_id': from_id, 'to_id': to_id}
+    fact_table = schema.fact_table
+    if sqlalchemy.inspect(connection).has_table(fact_table):
+        same_month = "`merged`.`Year` = `kept`.`Year` AND `merged`.`Month` = `kept`.`Month`"
+        # NULL + NULL stays NULL, NULL + x is x (as assign_bank_ids' sum(min_count=1))
+        sums = ", ".join(
+            f"`kept`.`{col}` = IF(`kept`.`{col}` IS NULL, `merged`.`{col}`, `kept`.`{col}` + COALESCE(`merged`.`{col}`, 0))"
+            for col in count_headers + amount_headers
+        )
+        connection.execute(text(
+            f"UPDATE `{fact_table}` AS `kept` JOIN `{fact_table}` AS `merged` "
+            f"ON `merged`.`bank_id` = :from_id AND {same_month} "
+            f"SET {sums} WHERE `kept`.`bank_id` = :to_id"
+        ), params)
+        connection.execute(text(
+            f"DELETE `merged` FROM `{fact_table}` AS `merged` JOIN `{fact_table}` AS `kept` "
+            f"ON `kept`.`bank_id` = :to_id AND {same_month} WHERE `merged`.`bank_id` = :from_id"
+        ), params)
+    for table_name in (fact_table, schema.bank_alias_table):
+        if sqlalchemy.inspect(connection).has_table(table_name):
+            connection.execute(text(f"UPDATE `{table_name}` SET `bank_id` = :to_id WHERE `bank_id` = :from_id"), params)
+    connection.execute(text(f"DELETE FROM `{schema.bank_dimension}` WHERE `bank_id` = :from_id"), {'from_id': from_id})
+
+
+def read_manual_aliases(path):
+    """{alias key: canonical name} from a CSV of alias,canonical name rows, or {} if there is no file."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f) if len(row) >= 2 and row[0].strip() and not row[0].startswith('#')]
+    if rows and rows[0][0].strip().lower() == 'alias':
+        rows = rows[1:]  # header row
+    return {normalize_name(row[0]): row[1].strip() for row in rows}
+
+
+def load_bank_resolver(connection, schema, manual, fuzzy_cutoff=None):
+    """
+    Builds the BankResolver for this run from the alias table. Banks without an
+    alias yet (loaded before the alias table existed) get one for their name;
+    banks whose names share a key, and banks a manual alias says are another
+    bank, are merged. Returns (resolver, number of banks merged).
+    """
+    ensure_bank_aliases(connection, schema)
+    aliases = dict(connection.execute(text(f"SELECT `alias_key`, `bank_id` FROM `{schema.bank_alias_table}`")).all())
+    merged = 0
+
+    def merge(from_id, to_id):
+        merge_banks(connection, schema, from_id, to_id)
+        for key, bank_id in aliases.items():
+            if bank_id == from_id:
+                aliases[key] = to_id
+
+    banks = connection.execute(text(f"SELECT `bank_id`, `Bank Name` FROM `{schema.bank_dimension}` ORDER BY `bank_id`")).all()
+    for bank_id, name in banks:
+        key = normalize_name(name)
+        if key not in aliases:
+            aliases[key] = bank_id
+            save_aliases(connection, schema, [(key, name, bank_id, 'name', None)])
+        elif aliases[key] != bank_id:
+            print(f"Merging bank {name!r} into bank {aliases[key]}: same normalized name")
+            merge(bank_id, aliases[key])
+            merged += 1
+
+    for alias_key, canonical_name in manual.items():
+        alias_id, canonical_id = aliases.get(alias_key), aliases.get(normalize_name(canonical_name))
+        if alias_id is None or alias_id == canonical_id:
+            continue  # Unseen aliases are resolved when they turn up
+        if canonical_id is None:
+            # Known bank, new canonical name: rename it
+            connection.execute(text(f"UPDATE `{schema.bank_dimension}` SET `Bank Name` = :name WHERE `bank_id` = :bank_id"),
+                               {'name': canonical_name, 'bank_id': alias_id})
+            aliases[normalize_name(canonical_name)] = alias_id
+            save_aliases(connection, schema, [(normalize_name(canonical_name), canonical_name, alias_id, 'manual', None)])
+        elif list(aliases.values()).count(alias_id) == 1:
+            print(f"Merging bank {alias_id} into bank {canonical_id}: manual alias for {canonical_name!r}")
+            merge(alias_id, canonical_id)
+            merged += 1
+        else:
+            # The alias's bank has other spellings too; only this spelling moves, for months loaded from now on
+            connection.execute(text(f"UPDATE `{schema.bank_alias_table}` SET `bank_id` = :bank_id, `method` = 'manual' WHERE `alias_key` = :alias_key"),
+                               {'bank_id': canonical_id, 'alias_key': alias_key})
+            aliases[alias_key] = canonical_id
+            print(f"Alias {alias_key!r} now maps to {canonical_name!r}; re-run with --full to move rows already loaded")
+    connection.commit()
+
+    def create_bank(name):
+        return connection.execute(text(f"INSERT INTO `{schema.bank_dimension}` (`Bank Name`) VALUES (:name)"), {'name': name}).lastrowid
+
+    return BankResolver(aliases, create_bank, manual=manual, fuzzy_cutoff=fuzzy_cutoff), merged
+
+
+def assign_bank_ids(connection, schema, fact_df, resolver):
+    """
+    Resolves fact_df's raw bank names to canonical bank ids (persisting any new
+    aliases) and returns the rows summed per bank_id, so spellings of the same
+    bank within one workbook collapse into one row.
+    """
+    bank_ids = {name: resolver.resolve(name) for name in fact_df['Bank Name'].unique()}
+    save_aliases(connection, schema, resolver.pop_new_aliases())
+    fact_df = fact_df.assign(bank_id=fact_df['Bank Name'].map(bank_ids))
+    return (fact_df.groupby(['bank_id', 'Year', 'Month'], as_index=False)[count_headers + amount_headers]
+            .sum(min_count=1))
+
+
+def upgrade_schema(connection, schema):
+    """
+    Moves a database loaded before the typed schema onto it: the old DISTINCT-name
+    bank table is replaced by the keyed bank dimension, and a fact table still
+    storing Bank Name is rebuilt with bank_id. Returns True if anything changed, so
+    the caller can rebuild the rollups. Month tables are retyped when next re-ingested.
+    """
+    fact_table, bank_dimension = schema.fact_table, schema.bank_dimension
+    upgraded = False
+    if sqlalchemy.inspect(connection).has_table(bank_dimension) and 'bank_id' not in table_columns(connection, bank_dimension):
+        connection.execute(text(f"DROP TABLE `{bank_dimension}`"))
+        upgraded = True
+    ensure_bank_dimension(connection, schema)
+    if sqlalchemy.inspect(connection).has_table(fact_table) and 'bank_id' not in table_columns(connection, fact_table):
+        print(f"Upgrading {fact_table} to bank_id keys")
+        years = connection.execute(text(f"SELECT DISTINCT `Year` FROM `{fact_table}`")).scalars().all()
+        connection.execute(text(
+            f"INSERT IGNORE INTO `{bank_dimension}` (`Bank Name`) "
+            f"SELECT DISTINCT TRIM(`Bank Name`) FROM `{fact_table}` ORDER BY 1"
+        ))
+        metric_cols = [f"`{col}`" for col in count_headers + amount_headers]
+        connection.execute(text(f"DROP TABLE IF EXISTS `tmp_{fact_table}`"))
+        connection.execute(text(fact_table_ddl(f"tmp_{fact_table}", years)))
+        connection.execute(text(
+            f"INSERT INTO `tmp_{fact_table}` (`bank_id`, {', '.join(metric_cols)}, `Year`, `Month`) "
+            f"SELECT b.`bank_id`, {', '.join('f.' + col for col in metric_cols)}, f.`Year`, f.`Month` FROM `{fact_table}` AS f "
+            f"JOIN `{bank_dimension}` AS b ON b.`Bank Name` = TRIM(f.`Bank Name`) COLLATE utf8mb4_bin"
+        ))
+        swap_in_table(connection, fact_table, f"tmp_{fact_table}")
+        upgraded = True
+    connection.commit()
+    return upgraded
+
+
+# Summary tables derived from the fact table for the graph routes, as
+# (group columns, column definitions and keys). They aggregate on bank_id and keep
+# the fact table's column names plus Bank Name, so app.py can query them with the same SQL
+# (idx_period_bank is in the transactions page order, so keyset pages are index range scans).
+# Keyed by table name without the metric prefix (see MetricSchema)
+rollup_tables = {
+    "rollup_monthly": (["`Year`", "`Month`"], f"""
+        `Year` SMALLINT NOT NULL,
+        `Month` TINYINT NOT NULL,
+        {metric_columns_ddl},
+        PRIMARY KEY (`Year`, `Month`)"""),
+    "rollup_bank": (["`bank_id`"], f"""
+        `bank_id` {bank_id_type} NOT NULL,
+        `Bank Name` {bank_name_type} NOT NULL,
+        {metric_columns_ddl},
+        PRIMARY KEY (`bank_id`)"""),
+    "rollup_bank_monthly": (["`bank_id`", "`Year`", "`Month`"], f"""
+        `bank_id` {bank_id_type} NOT NULL,
+        `Bank Name` {bank_name_type} NOT NULL,
+        `Year` SMALLINT NOT NULL,
+        `Month` TINYINT NOT NULL,
+        {metric_columns_ddl},
+        PRIMARY KEY (`bank_id`, `Year`, `Month`),
+        KEY `idx_period_bank` (`Year` DESC, `Month` DESC, `Bank Name`),
+        KEY `idx_bank_name` (`Bank Name`, `Year`, `Month`)"""),
+}
+
+
+def rollup_select(group_cols, source_table, bank_dimension):
+    """
+    SELECT summing the metrics of source_table per group_cols. Groups keyed by
+    bank_id are summed on the integer key first and only then joined to
+    bank_dimension for the name.
+    """
+    group_by = ", ".join(group_cols)
+    sums = ", ".join(f"SUM(`{col}`) AS `{col}`" for col in count_headers + amount_headers)
+    select = f"SELECT {group_by}, {sums} FROM `{source_table}` GROUP BY {group_by}"
+    if "`bank_id`" not in group_cols:
+        return select
+    return (f"SELECT b.`Bank Name`, r.* FROM ({select}) AS r "
+            f"JOIN `{bank_dimension}` AS b ON b.`bank_id` = r.`bank_id`")
+
+
+def build_rollups(connection, schema):
+    """Rebuilds every rollup table from the fact table with GROUP BY ... SUM(...)."""
+    for table_name, (group_cols, columns) in schema.rollup_tables.items():
+        connection.execute(text(f"DROP TABLE IF EXISTS `tmp_{table_name}`"))
+        connection.execute(text(
+            f"CREATE TABLE `tmp_{table_name}` ({columns}\n    ) "
+            f"{rollup_select(group_cols, schema.fact_table, schema.bank_dimension)}"
+        ))
+        swap_in_table(connection, table_name, f"tmp_{table_name}")
+        print(f"Rollup table {table_name} written")
+    connection.commit()
+
+
+# Prefix-sum tables: running totals of the monthly rollups, in period order
+# (period = Year * 12 + Month - 1), as (source rollup, bank columns carried over
+# (the first one partitions the totals), column definitions and keys). A window's total is the running total at its last month
+# minus the one before its first month: two primary key lookups
+cumulative_tables = {
+    "cumulative_monthly": ("rollup_monthly", [], f"""
+        `period` MEDIUMINT NOT NULL,
+        `Year` SMALLINT NOT NULL,
+        `Month` TINYINT NOT NULL,
+        {metric_columns_ddl},
+        PRIMARY KEY (`period`)"""),
+    "cumulative_bank_monthly": ("rollup_bank_monthly", ["`bank_id`", "`Bank Name`"], f"""
+        `bank_id` {bank_id_type} NOT NULL,
+        `Bank Name` {bank_name_type} NOT NULL,
+        `period` MEDIUMINT NOT NULL,
+        `Year` SMALLINT NOT NULL,
+        `Month` TINYINT NOT NULL,
+        {metric_columns_ddl},
+        PRIMARY KEY (`bank_id`, `period`),
+        KEY `idx_bank_name` (`Bank Name`, `period`)"""),
+}
+
+
+def cumulative_select(partition_cols, source_table):
+    """SELECT of source_table's rows with every metric replaced by its running total (per partition_cols[0], if any)."""
+    sums = ", ".join(f"SUM(`{col}`) OVER w AS `{col}`" for col in count_headers + amount_headers)
+    partition = f"PARTITION BY {partition_cols[0]} " if partition_cols else ""
+    return (f"SELECT {''.join(col + ', ' for col in partition_cols)}`Year` * 12 + `Month` - 1 AS `period`, `Year`, `Month`, {sums} "
+            f"FROM `{source_table}` WINDOW w AS ({partition}ORDER BY `Year`, `Month`)")
+
+
+def build_cumulative(connection, schema):
+    """Rebuilds the prefix-sum tables from the rollups (run after build_rollups)."""
+    for table_name, (source_table, partition_cols, columns) in schema.cumulative_tables.items():
+        connection.execute(text(f"DROP TABLE IF EXISTS `tmp_{table_name}`"))
+        connection.execute(text(
+            f"CREATE TABLE `tmp_{table_name}` ({columns}\n    ) "
+            f"{cumulative_select(partition_cols, source_table)}"
+        ))
+        swap_in_table(connection, table_name, f"tmp_{table_name}")
+        print(f"Prefix-sum table {table_name} written")
+    connection.commit()
+
+
+# Small dimension tables behind the app's filter dropdowns, rebuilt from the fact
+# table on every ingest (the bank dimension is maintained incrementally instead)
+dimension_tables = {
+    "dim_period": (["`Year`", "`Month`"], "PRIMARY KEY (`Year`, `Month`)"),
+}
+
+
+def build_dimensions(connection, schema):
+    """
+    Rebuilds the distinct (Year, Month) period table from the fact table and drops
+    banks no longer referenced by any fact row (and their aliases) from the bank dimension.
+    """
+    source_table, bank_dimension, bank_alias_table = schema.fact_table, schema.bank_dimension, schema.bank_alias_table
+    for table_name, (cols, keys) in schema.dimension_tables.items():
+        col_list = ", ".join(cols)
+        connection.execute(text(f"DROP TABLE IF EXISTS `tmp_{table_name}`"))
+        connection.execute(text(
+            f"CREATE TABLE `tmp_{table_name}` ({keys}) "
+            f"SELECT DISTINCT {col_list} FROM `{source_table}`"
+        ))
+        swap_in_table(connection, table_name, f"tmp_{table_name}")
+        print(f"Dimension table {table_name} written")
+    connection.execute(text(
+        f"DELETE FROM `{bank_alias_table}` WHERE NOT EXISTS "
+        f"(SELECT 1 FROM `{source_table}` AS f WHERE f.`bank_id` = `{bank_alias_table}`.`bank_id`)"
+    ))
+    removed = connection.execute(text(
+        f"DELETE FROM `{bank_dimension}` WHERE NOT EXISTS "
+        f"(SELECT 1 FROM `{source_table}` AS f WHERE f.`bank_id` = `{bank_dimension}`.`bank_id`)"
+    )).rowcount
+    if removed:
+        print(f"Removed {removed} unreferenced banks from {bank_dimension}")
+    connection.commit()
+
+
+def bump_data_version(connection, schema):
+    """Increments the data version (creating the one-row table on first use) and returns it."""
+    version_table = schema.version_table
+    connection.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS `{version_table}` (
+        `id` TINYINT NOT NULL PRIMARY KEY,
+        `version` BIGINT NOT NULL,
+        `updated_at` DATETIME NOT NULL
+    )
+    """))
+    connection.execute(text(
+        f"INSERT INTO `{version_table}` (`id`, `version`, `updated_at`) VALUES (1, 1, NOW()) "
+        f"ON DUPLICATE KEY UPDATE `version` = `version` + 1, `updated_at` = NOW()"
+    ))
+    connection.commit()
+    return connection.execute(text(f"SELECT `version` FROM `{version_table}` WHERE `id` = 1")).scalar()
+
+
+def ensure_manifest(connection, schema):
+    connection.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS `{schema.manifest_table}` (
+        `path` VARCHAR(512) NOT NULL PRIMARY KEY,
+        `size` BIGINT NOT NULL,
+        `mtime` DOUBLE NOT NULL,
+        `sha256` CHAR(64) NOT NULL,
+        `table_name` VARCHAR(128) NOT NULL,
+        `year` SMALLINT NULL,
+        `month` TINYINT NULL,
+        `row_count` INT NOT NULL,
+        `ingested_at` DATETIME NOT NULL
+    )
+    """))
+
+
+def read_manifest(connection, schema):
+    """Returns {relative path: manifest row as dict}."""
+    rows = connection.execute(text(f"SELECT * FROM `{schema.manifest_table}`")).mappings().all()
+    return {row['path']: dict(row) for row in rows}
+
+
+def record_manifest(connection, schema, entry):
+    connection.execute(text(f"""
+    REPLACE INTO `{schema.manifest_table}`
+        (`path`, `size`, `mtime`, `sha256`, `table_name`, `year`, `month`, `row_count`, `ingested_at`)
+    VALUES (:path, :size, :mtime, :sha256, :table_name, :year, :month, :row_count, NOW())
+    """), entry)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_ingest(jobs, manifest, root_path, schema, digests):
+    """
+    Compares the workbooks on disk with one metric's manifest. Returns (changed, sources, removed):
+    jobs needing a parse, {path: manifest entry} for them, and manifest entries whose
+    source file is gone. Files whose size and mtime match are not even hashed, and
+    digests ({path: sha256}) carries the hashes over to the other metrics' plans.
+    """
+    changed, sources, seen = [], {}, set()
+    for job in jobs:
+        folder, year_data, path = job
+        rel_path = os.path.relpath(path, root_path)
+        seen.add(rel_path)
+        stat = os.stat(path)
+        entry = manifest.get(rel_path)
+        if entry and entry['size'] == stat.st_size and abs(entry['mtime'] - stat.st_mtime) < 1e-6:
+            continue
+        if path not in digests:
+            digests[path] = file_sha256(path)
+        digest = digests[path]
+        if entry and entry['sha256'] == digest:
+            # Touched but identical: refresh size/mtime so the next run skips it cheaply
+            sources[path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime, unchanged=True)
+            continue
+        year = year_data.split(".")[0]
+        sources[path] = {
+            'path': rel_path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': digest,
+            'table_name': f"{schema.metric}_{year}_{folder}", 'year': int(folder),
+            'month': month_lookup.get(year.strip().lower()), 'row_count': 0,
+        }
+        changed.append(job)
+    removed = [entry for rel_path, entry in manifest.items() if rel_path not in seen]
+    return changed, sources, removed
+
+
+def remove_source(connection, schema, entry):
+    """Drops the table and fact rows produced by a workbook that no longer exists."""
+    connection.execute(text(f"DROP TABLE IF EXISTS `{entry['table_name']}`"))
+    if entry['month'] and sqlalchemy.inspect(connection).has_table(schema.fact_table):
+        connection.execute(text(f"DELETE FROM `{schema.fact_table}` WHERE `Year` = :year AND `Month` = :month"),
+                           {'year': entry['year'], 'month': entry['month']})
+    connection.execute(text(f"DELETE FROM `{schema.manifest_table}` WHERE `path` = :path"), {'path': entry['path']})
+    connection.commit()
+    print(f"Removed {entry['table_name']}: source {entry['path']} no longer exists")
+
+
+def refresh_snapshot(connection, schema, snapshot_dir):
+    """Rewrites the columnar snapshot of the fact table if the manifest changed since it was built."""
+    if not sqlalchemy.inspect(connection).has_table(schema.fact_table):
+        return
+    manifest_rows = connection.execute(text(f"SELECT `path`, `sha256` FROM `{schema.manifest_table}`")).all()
+    digest = snapshot.source_digest(manifest_rows)
+    meta = snapshot.read_meta(snapshot_dir)
+    if meta and meta.get('source_digest') == digest:
+        return
+    df = pd.read_sql(text(f"""
+        SELECT b.`Bank Name` AS bank_name, f.`Year` AS year, f.`Month` AS month,
+               f.`No. Of Outward Transactions` AS outward_count, f.`Amount(Outward)` AS outward_amount,
+               f.`No. Of Inward Transactions` AS inward_count, f.`Amount(Inward)` AS inward_amount
+        FROM `{schema.fact_table}` AS f JOIN `{schema.bank_dimension}` AS b ON b.`bank_id` = f.`bank_id`
+    """), connection)
+    snapshot.write_snapshot(df, snapshot_dir, digest)
+    print(f"Snapshot written to {snapshot_dir}: {len(df)} rows")
+
+
+def to_number(values):
+    """
+    Numeric Series from workbook cells. Text cells have whitespace and thousands
+    separators removed first ("1,234.5" -> 1234.5); cells that still aren't
+    numbers become NaN (see count_unparsed).
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.map(lambda value: value.replace(",", "").strip() if isinstance(value, str) else value)
+    return pd.to_numeric(values, errors='coerce')
+
+
+def count_unparsed(cells, numbers):
+    """Number of cells that held something but came out of to_number as NaN."""
+    filled = cells.map(lambda value: not is_blank(value) and not pd.isna(value))
+    return int((filled & numbers.isna()).sum())
+
+
+def to_typed_rows(df):
+    """
+    Coerces a parsed workbook to the month table's column types: whole-number
+    serials and counts, amounts rounded to 2 places, stripped bank names.
+    Cells that aren't numbers become NULL (parse_sheet reports how many).
+    """
+    typed_df = df.dropna(subset=['Bank Name']).copy()
+    typed_df['Bank Name'] = typed_df['Bank Name'].astype(str).str.strip()
+    for col in ['Sr. No'] + count_headers:
+        typed_df[col] = to_number(typed_df[col]).round().astype('Int64')
+    for col in amount_headers:
+        typed_df[col] = to_number(typed_df[col]).round(2)
+    return typed_df
+
+
+def to_fact_rows(df, year, month_num):
+    """Drops the serial column, coerces the metrics to numbers and tags the rows with Year/Month."""
+    fact_df = to_typed_rows(df).drop(columns=['Sr. No'])
+    return fact_df.assign(Year=year, Month=month_num)
+
+
+class MetricSchema:
+    """
+    Database and table names of one metric. Each metric is loaded into its own
+    rbi_metric_<metric> database, with the tables named after the metric
+    (neft_fact, rtgs_fact, ...), so app.py serves any of them by prefix.
+    """
+
+    def __init__(self, metric):
+        prefix = metric.lower()
+        self.metric = metric
+        self.database = f"rbi_metric_{metric}"
+        # Consolidated fact table holding every month, queried directly by app.py
+        self.fact_table = f"{prefix}_fact"
+        # Bank dimension: bank_id -> Bank Name. Rows are only ever added (see assign_bank_ids),
+        # so a bank keeps its id across ingests
+        self.bank_dimension = f"{prefix}_dim_bank"
+        # Every bank name spelling seen so far, by normalized key (see bank_identity.py)
+        self.bank_alias_table = f"{prefix}_bank_alias"
+        # Data version polled by app.py: bumped once per ingest that changed any table
+        self.version_table = f"{prefix}_data_version"
+        # Manifest of ingested workbooks: lets later runs skip files whose content is unchanged
+        self.manifest_table = f"{prefix}_ingest_manifest"
+        self.rollup_tables = {f"{prefix}_{name}": spec for name, spec in rollup_tables.items()}
+        self.cumulative_tables = {
+            f"{prefix}_{name}": (f"{prefix}_{source_table}", partition_cols, columns)
+            for name, (source_table, partition_cols, columns) in cumulative_tables.items()
+        }
+        self.dimension_tables = {f"{prefix}_{name}": spec for name, spec in dimension_tables.items()}
 
-root_path = os.path.join(os.getcwd(),root)
-os.chdir(root_path)
-folders  = [year for year in os.listdir() if year.isdigit()]
 
 user = "root"
 password = "2102005"
 port = 3306
 host = "localhost"
 
-conn = pymysql.connect(
-    user = user,
-    password = password,
-    port = port,
-    host = host,
-    charset="utf8mb4",
-    autocommit=True
-)
 
-try:
-    with conn.cursor() as cursor:
-        cursor.execute("SHOW DATABASES LIKE 'rbi_metric_%';")
-        databases = cursor.fetchall()
-        
-        for (db_name,) in databases:
-            drop_query = f"DROP DATABASE `{db_name}`;"
-            cursor.execute(drop_query)
-        
-        new_db_name = f"rbi_metric_{metric}"
-        create_query = f"CREATE DATABASE `{new_db_name}`;"
-        cursor.execute(create_query)
-
-    print(f"Database Created: {new_db_name}")
-        
-except Exception as e:
-    print(e)
-
-print(f"mysql+pymysql://{user}:{password}@{host}/{new_db_name}")
-engine = sqlalchemy.create_engine(f"mysql+pymysql://{user}:{password}@{host}/{new_db_name}")
-
-
-try:
-    with engine.connect() as connection:
-        
-        for folder in folders:
-            current_path = os.path.join(root_path,folder)
-            os.chdir(current_path)
-            for year_data in os.listdir():
-                year = year_data.split(".")[0]
-                extension = year_data.split(".")[-1]
-                if extension == "XLS":
-                    #df = pd.read_excel(year_data,engine="xlrd",sheet_name="NEFT",header=None)
-                    engine = "xlrd"
-                elif extension == "XLSX":
-                    #df = pd.read_excel(year_data,engine="openpyxl",sheet_name="NEFT",header=None)
-                    engine = "openpyxl"
-                elif extension not in supported_formats:
-                    print("File Format Not Supported")
-                    continue      
-                df = pd.read_excel(year_data,engine=engine,sheet_name="NEFT",header=None)
-                search_area = df.head()
-                row_idx = df.where((search_area == "Sr. No.") | (search_area == "Sr. No")| (search_area == "Sr.No")).stack().index[0][0]
-                #replace later with .isfind and .idxmax, accoutn for all possible permutatios of the col name we are searching for
-
-                df = df.iloc[row_idx+2:-2,:]
-                df = df.dropna(axis=1, how='all')
-                df.columns = neft_headers
-                df = df.reset_index(drop=True)
-
-                df.to_sql(f"{metric}_{year}_{folder}",con=connection,if_exists="replace",index=False)
-except Exception as e:
-    print(e)
+def is_workbook(path):
+    return path.split(".")[-1].upper() in supported_formats
+
+
+def list_workbooks(root_path):
+    """
+    Returns (folder, file_name, path) for every workbook inside the year folders under
+    root_path. Other files are skipped here, before plan_ingest hashes anything.
+    """
+    jobs = []
+    folders = [year for year in os.listdir(root_path) if year.isdigit()]
+    for folder in folders:
+        current_path = os.path.join(root_path,folder)
+        for year_data in os.listdir(current_path):
+            path = os.path.join(current_path, year_data)
+            if not is_workbook(path):
+                print(f"File Format Not Supported: {path}")
+                continue
+            jobs.append((folder, year_data, path))
+    return jobs
+
+
+# Rows searched for the "Sr. No" header cell before giving up on a sheet
+header_scan_rows = 30
+
+
+def is_serial_header(value):
+    """True for the serial column header in any of its spellings ("Sr. No.", "Sr.No", "SR NO", ...)."""
+    return isinstance(value, str) and value.replace(".", "").replace(" ", "").lower() == "srno"
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def iter_workbook_sheets(path, sheet_names):
+    """
+    Opens the workbook once and yields (sheet name, rows) for each of sheet_names
+    it has, rows being an iterator of tuples of cell values. Only those sheets are
+    read: openpyxl read-only streaming for XLSX, xlrd on_demand for XLS (each sheet
+    unloaded once its rows are consumed).
+    """
+    extension = path.split(".")[-1].upper()
+    if extension == "XLSX":
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet_name in sheet_names:
+                if sheet_name in workbook.sheetnames:
+                    yield sheet_name, workbook[sheet_name].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    elif extension == "XLS":
+        import xlrd
+        workbook = xlrd.open_workbook(path, on_demand=True)
+        try:
+            for sheet_name in sheet_names:
+                if sheet_name in workbook.sheet_names():
+                    sheet = workbook.sheet_by_name(sheet_name)
+                    yield sheet_name, (tuple(sheet.row_values(row_idx)) for row_idx in range(sheet.nrows))
+                    workbook.unload_sheet(sheet_name)
+        finally:
+            workbook.release_resources()
+    else:
+        raise ValueError(f"File Format Not Supported: {path}")
+
+
+def parse_sheet(rows, spec, path):
+    """
+    Parses one metric sheet's rows into a DataFrame with neft_headers columns.
+
+    The header row is the first row (within header_scan_rows) holding a "Sr. No"
+    cell. Data starts at the first row below it with a bank name, and stops at
+    the first blank or "Total" bank name, so the sub-header and footer rows are
+    found rather than assumed to be a fixed number of lines. The data columns
+    must match spec['headers']; they are then converted to numbers (see
+    to_number) and summed into the stored columns per spec['columns']. Cells
+    that aren't numbers are stored as NULL and counted in a printed warning.
+    """
+    serial_col = bank_col = None
+    data_rows = []
+    for row_idx, row in enumerate(rows):
+        if serial_col is None:
+            serial_col = next((i for i, value in enumerate(row) if is_serial_header(value)), None)
+            if serial_col is None and row_idx >= header_scan_rows:
+                raise ValueError(f"No 'Sr. No' header in the first {header_scan_rows} rows of {spec['sheet']} in {path}")
+            continue
+        if bank_col is None:
+            # First data row: a serial number followed by the bank name
+            serial = row[serial_col] if serial_col < len(row) else None
+            if isinstance(serial, str): serial = serial.strip()
+            if is_blank(serial) or not str(serial).replace(".", "", 1).isdigit():
+                continue
+            bank_col = next((i for i in range(serial_col + 1, len(row)) if not is_blank(row[i])), None)
+            if bank_col is None:
+                continue
+        bank = row[bank_col] if bank_col < len(row) else None
+        if is_blank(bank) or str(bank).strip().lower().startswith("total"):
+            break
+        data_rows.append(row[serial_col:])
+
+    if serial_col is None:
+        raise ValueError(f"No 'Sr. No' header found in {spec['sheet']} in {path}")
+    # Keep only the columns that hold data (merged header cells leave empty spacer columns)
+    headers = spec['headers']
+    width = max((len(row) for row in data_rows), default=0)
+    used_cols = [i for i in range(width) if any(i < len(row) and not is_blank(row[i]) for row in data_rows)]
+    if len(used_cols) != len(headers):
+        raise ValueError(f"Expected {len(headers)} data columns in {spec['sheet']} in {path}, found {len(used_cols)}")
+    df = pd.DataFrame([[row[i] if i < len(row) else None for i in used_cols] for row in data_rows], columns=headers)
+    columns, unparsed = {}, {}
+    for col, sources in spec['columns'].items():
+        if col == 'Bank Name':
+            columns[col] = df[sources[0]]
+            continue
+        numbers = df[sources].apply(to_number)
+        for source in sources:
+            failed = count_unparsed(df[source], numbers[source])
+            if failed:
+                unparsed[source] = failed
+        columns[col] = numbers[sources[0]] if len(sources) == 1 else numbers.sum(axis=1, min_count=1)
+    if unparsed:
+        counts = ", ".join(f"{source}: {failed}" for source, failed in unparsed.items())
+        print(f"{path} {spec['sheet']}: {sum(unparsed.values())} cells are not numbers, stored as NULL ({counts})")
+    return pd.DataFrame(columns)[neft_headers]
+
+
+def read_workbook(path, specs):
+    """
+    Parses every sheet of specs ({metric: spec}) in one pass over the workbook.
+    Returns {metric: DataFrame}, None for a sheet that failed to parse; metrics
+    whose sheet the workbook lacks are left out. Returns None if the format is unsupported.
+    """
+    if not is_workbook(path):
+        print(f"File Format Not Supported: {path}")
+        return None
+
+    metrics = {spec['sheet']: metric for metric, spec in specs.items()}
+    frames = {}
+    for sheet_name, rows in iter_workbook_sheets(path, list(metrics)):
+        metric = metrics[sheet_name]
+        try:
+            frames[metric] = parse_sheet(rows, specs[metric], path)
+        except Exception as e:
+            print(f"Error parsing {sheet_name} in {path}: {e}")
+            frames[metric] = None
+    return frames
+
+
+def parse_job(job, specs):
+    """Worker entry point: parses one workbook's sheets and returns them with the parse time."""
+    folder, year_data, path = job
+    start = time.perf_counter()
+    try:
+        frames = read_workbook(path, specs)
+    except Exception as e:
+        print(f"Error parsing {path}: {e}")
+        frames = None
+    if frames is None:
+        frames = {metric: None for metric in specs}
+    return folder, year_data, frames, time.perf_counter() - start
+
+
+def iter_parsed(jobs, workers):
+    """
+    Yields parse_job results for (job, specs) pairs, from a process pool when
+    workers > 1, as each workbook finishes.
+    """
+    if workers <= 1:
+        for job, specs in jobs:
+            yield parse_job(job, specs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_job, job, specs) for job, specs in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def load_table(connection, df, table_name, chunksize):
+    """Bulk loads df into the existing (typed) table with multi-row INSERT statements of chunksize rows each."""
+    df.to_sql(table_name,con=connection,if_exists="append",index=False,method="multi",chunksize=chunksize)
+
+
+def load_month(connection, schema, entry, df, resolver, chunksize):
+    """Writes one parsed sheet to its month table and replaces its month in the fact table."""
+    # Month table: load into a typed staging table, then swap it in
+    connection.execute(text(f"DROP TABLE IF EXISTS `tmp_{entry['table_name']}`"))
+    connection.execute(text(month_table_ddl(f"tmp_{entry['table_name']}")))
+    load_table(connection, to_typed_rows(df), f"tmp_{entry['table_name']}", chunksize)
+    swap_in_table(connection, entry['table_name'], f"tmp_{entry['table_name']}")
+
+    # Fact rows for the month are replaced in one transaction
+    if entry['month']:
+        connection.execute(text(f"DELETE FROM `{schema.fact_table}` WHERE `Year` = :year AND `Month` = :month"),
+                           {'year': entry['year'], 'month': entry['month']})
+        fact_df = assign_bank_ids(connection, schema, to_fact_rows(df, entry['year'], entry['month']), resolver)
+        load_table(connection, fact_df, schema.fact_table, chunksize)
+    else:
+        print(f"Skipping {entry['path']} for {schema.fact_table}: unknown month name")
+
+
+def connect_server():
+    return pymysql.connect(
+        user = user,
+        password = password,
+        port = port,
+        host = host,
+        charset="utf8mb4",
+        autocommit=True
+    )
+
+
+def ensure_database(db_name):
+    conn = connect_server()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`;")
+    finally:
+        conn.close()
+
+
+def recreate_database(db_name):
+    conn = connect_server()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`;")
+            cursor.execute(f"CREATE DATABASE `{db_name}`;")
+
+        print(f"Database Created: {db_name}")
+    except Exception as e:
+        print(e)
+    finally:
+        conn.close()
+
+
+def print_report(timings, total_seconds):
+    """Per-file parse/load timings and rows/second, then the run totals."""
+    print(f"{'File':<28}{'Rows':>8}{'Parse s':>10}{'Load s':>10}{'Rows/s':>12}")
+    for name, rows, parse_s, load_s in sorted(timings):
+        rate = rows / (parse_s + load_s) if parse_s + load_s else 0
+        print(f"{name:<28}{rows:>8}{parse_s:>10.2f}{load_s:>10.2f}{rate:>12.0f}")
+    total_rows = sum(rows for _, rows, _, _ in timings)
+    rate = total_rows / total_seconds if total_seconds else 0
+    print(f"Loaded {total_rows} rows from {len(timings)} files in {total_seconds:.2f}s ({rate:.0f} rows/s)")
+
+
+def prepare_metric(connection, schema, workbooks, root_path, digests, args):
+    """
+    Brings one metric's database up to date with everything but the changed
+    workbooks: upgrades the schema, loads the bank resolver, refreshes touched
+    manifest entries and drops removed sources. Returns the run state for it.
+    """
+    ensure_manifest(connection, schema)
+    connection.commit()
+    upgraded = upgrade_schema(connection, schema)
+    resolver, merged = load_bank_resolver(connection, schema, read_manual_aliases(args.aliases), args.fuzzy_cutoff)
+    changed, sources, removed = plan_ingest(workbooks, read_manifest(connection, schema), root_path, schema, digests)
+    for entry in sources.values():
+        if entry.pop('unchanged', False):
+            record_manifest(connection, schema, entry)
+    connection.commit()
+    for entry in removed:
+        remove_source(connection, schema, entry)
+    print(f"{schema.metric}: {len(changed)} workbooks new or changed, {len(removed)} removed")
+
+    if changed:
+        ensure_fact_table(connection, schema, {int(folder) for folder, _, _ in changed})
+        connection.commit()
+    return {
+        'connection': connection, 'schema': schema, 'resolver': resolver, 'changed': changed,
+        'sources': sources, 'loaded': 0, 'rebuild': upgraded or merged > 0 or bool(removed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the RBI payment system workbooks into MySQL, one database per metric.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes used to parse workbooks (1 = serial)")
+    parser.add_argument("--chunksize", type=int, default=1000,
+                        help="rows per multi-row INSERT statement")
+    parser.add_argument("--metrics", nargs="+", choices=list(metric_specs), default=list(metric_specs),
+                        help="sheets to load; every workbook is opened once for all of them")
+    parser.add_argument("--full", action="store_true",
+                        help="drop the metrics' databases and reload all workbooks")
+    parser.add_argument("--aliases", default=os.path.join(root, "bank_aliases.csv"),
+                        help="CSV of alias,canonical name rows mapping bank name spellings (or merged banks) to one bank")
+    parser.add_argument("--fuzzy-cutoff", type=float, default=None,
+                        help="match unknown bank names to the closest known one at this similarity (0-1, e.g. 0.92)")
+    args = parser.parse_args()
+
+    root_path = os.path.join(os.getcwd(),root)
+    run_start = time.perf_counter()
+    workbooks = list_workbooks(root_path)
+    schemas = [MetricSchema(metric) for metric in args.metrics]
+
+    timings = []
+
+    try:
+        with ExitStack() as stack:
+            states, digests = {}, {}
+            for schema in schemas:
+                if args.full:
+                    recreate_database(schema.database)
+                else:
+                    ensure_database(schema.database)
+                print(f"mysql+pymysql://{user}:{password}@{host}/{schema.database}")
+                engine = sqlalchemy.create_engine(f"mysql+pymysql://{user}:{password}@{host}/{schema.database}")
+                stack.callback(engine.dispose)
+                connection = stack.enter_context(engine.connect())
+                states[schema.metric] = prepare_metric(connection, schema, workbooks, root_path, digests, args)
+
+            # One parse per workbook covers every metric it changed for
+            jobs = {}
+            for metric, state in states.items():
+                for job in state['changed']:
+                    jobs.setdefault(job, {})[metric] = metric_specs[metric]
+
+            for folder, year_data, frames, parse_seconds in iter_parsed(list(jobs.items()), args.workers):
+                path = os.path.join(root_path, folder, year_data)
+                load_start, rows = time.perf_counter(), 0
+                for metric, df in frames.items():
+                    if df is None:
+                        continue
+                    state = states[metric]
+                    connection, schema, entry = state['connection'], state['schema'], state['sources'][path]
+                    load_month(connection, schema, entry, df, state['resolver'], args.chunksize)
+                    record_manifest(connection, schema, dict(entry, row_count=len(df)))
+                    connection.commit()
+                    state['loaded'] += 1
+                    rows += len(df)
+                for metric in jobs[(folder, year_data, path)]:
+                    if metric not in frames:
+                        # No sheet for this metric in the workbook: remembered so it isn't re-read
+                        state = states[metric]
+                        record_manifest(state['connection'], state['schema'], state['sources'][path])
+                        state['connection'].commit()
+                timings.append((f"{folder}/{year_data}", rows, parse_seconds, time.perf_counter() - load_start))
+
+            for metric, state in states.items():
+                connection, schema = state['connection'], state['schema']
+                rebuild = state['loaded'] > 0 or state['rebuild']
+                if rebuild:
+                    build_rollups(connection, schema)
+                    build_cumulative(connection, schema)
+                    build_dimensions(connection, schema)
+                else:
+                    print(f"{metric}: everything is up to date.")
+                state['resolver'].report()
+                refresh_snapshot(connection, schema, os.path.join(root_path, "snapshot", metric.lower()))
+                if rebuild:
+                    print(f"{metric} data version is now {bump_data_version(connection, schema)}")
+    except Exception as e:
+        print(e)
+
+    print_report(timings, time.perf_counter() - run_start)
+
+
+if __name__ == "__main__":
+    main()
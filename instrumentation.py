@@ -0,0 +1,162 @@
+import time
+import threading
+from contextlib import contextmanager
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, labels, value):
+        # Caller holds the Metrics lock
+        series = self._series.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class Metrics:
+    """
+    Per-request phase timing for the Flask app. Each request collects the time
+    spent in SQL (cursor events), Jinja (template signals) and any block wrapped
+    in timed(name) (pandas transforms, matplotlib rendering). The phases are sent
+    back as a Server-Timing header and aggregated into Prometheus histograms,
+    named with prefix (the served metric's table prefix, e.g. neft_ or rtgs_).
+    """
+
+    def __init__(self, prefix="neft"):
+        self._lock = threading.Lock()
+        self.prefix = prefix
+        self.requests = {}  # (route, status) -> count
+        self.latency = Histogram(f"{prefix}_request_duration_seconds", "Request latency by route.", ("route",), LATENCY_BUCKETS)
+        self.phases = Histogram(f"{prefix}_request_phase_seconds", "Time per request phase (sql, pandas, plot, template).", ("route", "phase"), LATENCY_BUCKETS)
+        self.sizes = Histogram(f"{prefix}_response_size_bytes", "Response body size by route.", ("route",), SIZE_BUCKETS)
+        self.rows = Histogram(f"{prefix}_rows_returned", "Rows returned to a route by its queries.", ("route",), ROW_BUCKETS)
+        self.extra_collectors = []
+
+    def install(self, app, engine_getter):
+        """Hooks the app's request cycle, template signals and the SQLAlchemy engine."""
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        with app.app_context():
+            engine = engine_getter()
+            event.listen(engine, 'before_cursor_execute', self._query_started)
+            event.listen(engine, 'after_cursor_execute', self._query_finished)
+
+    # --- Request-scoped timing ---
+    def _start_request(self):
+        g.request_start = time.perf_counter()
+        g.phase_times = {}
+        g.rows_returned = None
+
+    def add_phase(self, name, seconds):
+        if has_request_context() and 'phase_times' in g:
+            g.phase_times[name] = g.phase_times.get(name, 0.0) + seconds
+
+    def _phase_total(self):
+        return sum(g.phase_times.values()) if has_request_context() and 'phase_times' in g else 0.0
+
+    @contextmanager
+    def timed(self, name, exclusive=False):
+        """
+        Adds the time spent in the with-block to the current request's name phase.
+        With exclusive=True, time already attributed to other phases inside the
+        block (e.g. its SQL) is left out, so the phases don't overlap.
+        """
+        start, nested_before = time.perf_counter(), self._phase_total()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if exclusive:
+                elapsed -= self._phase_total() - nested_before
+            self.add_phase(name, elapsed)
+
+    def add_rows(self, count):
+        if has_request_context() and 'phase_times' in g:
+            g.rows_returned = (g.rows_returned or 0) + count
+
+    def _query_started(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_start = time.perf_counter()
+
+    def _query_finished(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_start' in g:
+            self.add_phase('sql', time.perf_counter() - g.pop('query_start'))
+
+    def _template_started(self, sender, template, context, **extra):
+        g.template_start = time.perf_counter()
+
+    def _template_finished(self, sender, template, context, **extra):
+        if 'template_start' in g:
+            self.add_phase('template', time.perf_counter() - g.pop('template_start'))
+
+    def _finish_request(self, response):
+        if 'request_start' not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+        route = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        phases = dict(g.phase_times)
+
+        timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(phases.items())]
+        timings.append(f"total;dur={total * 1000:.1f}")
+        response.headers['Server-Timing'] = ", ".join(timings)
+
+        # Streamed bodies have no size until they are sent
+        size = None if response.is_streamed else response.calculate_content_length()
+        with self._lock:
+            key = (route, str(response.status_code))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.observe((route,), total)
+            for name, seconds in phases.items():
+                self.phases.observe((route, name), seconds)
+            if size is not None:
+                self.sizes.observe((route,), size)
+            if g.rows_returned is not None:
+                self.rows.observe((route,), g.rows_returned)
+        return response
+
+    # --- Prometheus exposition ---
+    def add_collector(self, collector):
+        """Registers a callable returning extra exposition lines (e.g. cache statistics)."""
+        self.extra_collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            name = f"{self.prefix}_requests_total"
+            lines = [f"# HELP {name} Requests by route and status.", f"# TYPE {name} counter"]
+            for (route, status), count in sorted(self.requests.items()):
+                lines.append(f'{name}{{route="{route}",status="{status}"}} {count}')
+            for histogram in (self.latency, self.phases, self.sizes, self.rows):
+                lines.extend(histogram.render())
+        for collector in self.extra_collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+import re
+import time
+import hashlib
+import threading
+from collections import deque
+from sqlalchemy import event
+
+# Literal values and the per-month table names (<metric>_<month>_<year>) are folded
+# out of fingerprints, so the same query shape groups together however many months
+# the UNION ALL spans
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_MONTH_TABLE = re.compile(r"`?([a-zA-Z]+)_[a-zA-Z]+_\d{4}`?")
+_UNION_REPEAT = re.compile(r"(SELECT .+? FROM [a-z]+_\?)(?: UNION ALL \1)+", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """Normalized statement text: literals and params as ?, month tables as <prefix>_?, repeated UNION ALL arms folded."""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _MONTH_TABLE.sub(lambda match: f"{match.group(1).lower()}_?", normalized)
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    return _UNION_REPEAT.sub(r"\1 UNION ALL ...", normalized)
+
+
+class QueryProfiler:
+    """
+    Records fingerprint, duration and row count of every statement on an engine.
+    Statements slower than threshold_ms are kept in a ring buffer with their
+    EXPLAIN output (captured once per fingerprint every explain_ttl seconds).
+
+    Row counts come from cursor.rowcount, which PyMySQL fills in for buffered
+    SELECTs. Streamed results (stream_results, PyMySQL's SSCursor) aren't counted
+    until they are read, and report -1 or 2**64 - 1 (unsigned -1); those and
+    drivers that report -1 (e.g. sqlite3) leave rows as None.
+
+    namespace (e.g. the metric) prefixes the fingerprint ids and labels the
+    report, so reports from processes serving different databases don't mix.
+    """
+
+    def __init__(self, threshold_ms=200, max_entries=100, explain_ttl=600, namespace=None):
+        self.threshold_ms = threshold_ms
+        self.namespace = namespace
+        self.explain_ttl = explain_ttl
+        self.slow_queries = deque(maxlen=max_entries)
+        self.stats = {}  # fingerprint id -> aggregate
+        self._explains = {}  # fingerprint id -> (captured at, plan rows)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def install(self, engine):
+        self.engine = engine
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start')
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if getattr(self._local, 'explaining', False):
+            return  # Don't profile our own EXPLAIN statements
+        rows = cursor.rowcount
+        if rows is None or not 0 <= rows < 2 ** 63 or (context is not None and context.execution_options.get('stream_results')):
+            rows = None
+        text = fingerprint(statement)
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+        if self.namespace:
+            key = f"{self.namespace}-{key}"
+
+        with self._lock:
+            entry = self.stats.setdefault(key, {
+                'fingerprint': text, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow_count': 0,
+            })
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            if rows is not None:
+                entry['rows'] += rows
+            if duration_ms < self.threshold_ms:
+                return
+            entry['slow_count'] += 1
+
+        plan = self._explain(key, conn, statement, parameters, executemany)
+        with self._lock:
+            self.slow_queries.append({
+                'id': key,
+                'at': time.time(),
+                'duration_ms': round(duration_ms, 2),
+                'rows': rows,
+                'statement': statement if len(statement) <= 4000 else statement[:4000] + " ...",
+                'explain': plan,
+            })
+
+    def _explain(self, key, conn, statement, parameters, executemany):
+        """EXPLAIN rows for a slow SELECT, reusing a recent capture for the same fingerprint."""
+        with self._lock:
+            cached = self._explains.get(key)
+        if cached and time.time() - cached[0] < self.explain_ttl:
+            return cached[1]
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == 'sqlite' else "EXPLAIN "
+        self._local.explaining = True
+        try:
+            # Separate pooled connection: the profiled one may still have rows pending
+            with self.engine.connect() as explain_conn:
+                result = explain_conn.exec_driver_sql(prefix + statement, parameters)
+                plan = [dict(row._mapping) for row in result]
+        except Exception as e:
+            plan = [{'error': str(e)}]
+        finally:
+            self._local.explaining = False
+        with self._lock:
+            self._explains[key] = (time.time(), plan)
+        return plan
+
+    def report(self, limit=20):
+        """Worst slow queries (by duration) and the busiest fingerprints (by total time)."""
+        with self._lock:
+            worst = sorted(self.slow_queries, key=lambda query: query['duration_ms'], reverse=True)[:limit]
+            busiest = sorted(
+                ({'id': key, **entry, 'avg_ms': entry['total_ms'] / entry['count']} for key, entry in self.stats.items()),
+                key=lambda entry: entry['total_ms'], reverse=True,
+            )[:limit]
+        return {'namespace': self.namespace, 'threshold_ms': self.threshold_ms, 'slow_queries': worst, 'fingerprints': busiest}
+
+    def clear(self):
+        with self._lock:
+            self.slow_queries.clear()
+            self.stats.clear()
+            self._explains.clear()
@@ -0,0 +1,184 @@
+import io
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+
+class RenderBusy(Exception):
+    """Every render slot is taken; the caller should answer 503 and retry later."""
+
+
+class RenderTimeout(Exception):
+    """A render job did not finish within the pool's timeout."""
+
+
+def _init_worker():
+    # Pay the matplotlib import once per worker, not on the first request
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def render_spec(spec):
+    """
+    Draws a plot specification and returns the image bytes. Uses the Figure
+    API (no pyplot global state), so it is safe in worker processes and threads.
+
+    spec keys: kind ('line', 'area', 'bar', 'barh'), x, y, dates (x values are
+    ISO dates), title, xlabel, ylabel, figsize, color, line_color, marker,
+    grid, plain_axis ('x' or 'y'), xtick_rotation, xtick_ha, format ('png', 'svg').
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=spec.get('figsize', (12, 7)))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    x = [datetime.fromisoformat(value) for value in spec['x']] if spec.get('dates') else spec['x']
+    y = spec['y']
+    kind = spec['kind']
+    if kind == 'line':
+        ax.plot(x, y, marker=spec.get('marker', 'o'), linestyle='-', color=spec.get('color'))
+    elif kind == 'area':
+        ax.fill_between(x, y, alpha=0.4, color=spec.get('color'))
+        ax.plot(x, y, marker=spec.get('marker', '.'), linestyle='-', color=spec.get('line_color'))
+    elif kind == 'bar':
+        ax.bar(x, y, color=spec.get('color'))
+    elif kind == 'barh':
+        ax.barh(x, y, color=spec.get('color'))
+    else:
+        raise ValueError(f"Unknown chart kind: {kind}")
+
+    ax.set_title(spec.get('title', ''))
+    if spec.get('xlabel'): ax.set_xlabel(spec['xlabel'])
+    if spec.get('ylabel'): ax.set_ylabel(spec['ylabel'])
+    if spec.get('grid'): ax.grid(True, linestyle='--', alpha=0.6)
+    if spec.get('plain_axis'): ax.ticklabel_format(style='plain', axis=spec['plain_axis'])
+    if spec.get('xtick_rotation'):
+        ax.tick_params(axis='x', labelrotation=spec['xtick_rotation'])
+        if spec.get('xtick_ha'):
+            for label in ax.get_xticklabels():
+                label.set_horizontalalignment(spec['xtick_ha'])
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format=spec.get('format', 'png'), bbox_inches='tight')
+    return buf.getvalue()
+
+
+class RenderPool:
+    """
+    Renders plot specifications in worker processes so matplotlib neither shares
+    pyplot state across request threads nor holds the web worker's GIL.
+
+    At most max_pending jobs (queued plus running) are admitted; a caller that
+    can't get a slot within queue_wait seconds gets RenderBusy, and one whose job
+    runs past timeout gets RenderTimeout. A timed-out job keeps its slot until it
+    actually finishes, so a slow renderer applies back-pressure instead of piling
+    up work; if it is still running hung_grace seconds later its worker is taken
+    to be hung, and the pool's workers are terminated and replaced, which fails
+    the pool's jobs and frees their slots. workers=0 renders inline in the
+    calling thread.
+    """
+
+    # Called in the worker processes; must be picklable by reference
+    render_function = staticmethod(render_spec)
+
+    def __init__(self, workers=2, max_pending=8, timeout=30.0, queue_wait=0.5, hung_grace=30.0):
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_wait = queue_wait
+        self.hung_grace = hung_grace
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {'rendered': 0, 'busy': 0, 'timeouts': 0, 'errors': 0, 'hung': 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _reset_executor(self, executor):
+        """Shuts down a broken executor (a worker died) so the next job starts a fresh pool."""
+        with self._lock:
+            self.stats['errors'] += 1
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reap_if_hung(self, executor, future):
+        """Terminates executor's workers if a timed-out job is still running after hung_grace."""
+        if future.done():
+            return
+        with self._lock:
+            self.stats['hung'] += 1
+        # The executor notices its dead workers and fails every pending future with
+        # BrokenProcessPool, whose done callbacks release the slots
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        self._reset_executor(executor)
+
+    def _submit(self, spec):
+        """(executor, future) for a render job, retrying once on a fresh pool if the current one is broken."""
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(self.render_function, spec)
+        except BrokenProcessPool:
+            # Broken by a worker that died after its caller gave up (e.g. a timed-out job)
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(self.render_function, spec)
+
+    def render(self, spec):
+        if self.workers <= 0:
+            image = self.render_function(spec)
+            with self._lock:
+                self.stats['rendered'] += 1
+            return image
+
+        if not self._slots.acquire(timeout=self.queue_wait):
+            with self._lock:
+                self.stats['busy'] += 1
+            raise RenderBusy("All chart render slots are busy.")
+        try:
+            executor, future = self._submit(spec)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            image = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if not future.cancel():  # Only succeeds if the job hasn't started yet
+                reaper = threading.Timer(self.hung_grace, self._reap_if_hung, (executor, future))
+                reaper.daemon = True
+                reaper.start()
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise RenderTimeout(f"Chart rendering took longer than {self.timeout}s.")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for the next job
+            self._reset_executor(executor)
+            raise
+        with self._lock:
+            self.stats['rendered'] += 1
+        return image
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, workers=self.workers)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
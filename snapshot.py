@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Column name -> dtype of every array in the snapshot (bank_name is stored as codes + categories)
+SNAPSHOT_COLUMNS = {
+    'year': np.int16,
+    'month': np.int8,
+    'outward_count': np.int64,
+    'outward_amount': np.float64,
+    'inward_count': np.int64,
+    'inward_amount': np.float64,
+}
+BANK_CODES_FILE = "bank_name.codes.npy"
+BANK_CATEGORIES_FILE = "bank_name.categories.json"
+META_FILE = "meta.json"
+
+
+def source_digest(manifest_rows):
+    """Fingerprint of the ingest manifest ((path, sha256) pairs) the snapshot was built from."""
+    digest = hashlib.sha1()
+    for path, sha256 in sorted((str(path), str(sha256)) for path, sha256 in manifest_rows):
+        digest.update(f"{path}:{sha256}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def read_meta(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(df, snapshot_dir, digest):
+    """
+    Writes df (pandas-variant column names) as one typed .npy file per column plus
+    the bank categories, into a temp directory that then replaces snapshot_dir.
+    """
+    tmp_dir = f"{snapshot_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for col, dtype in SNAPSHOT_COLUMNS.items():
+        values = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=dtype)
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), values)
+    banks = pd.Categorical(df['bank_name'].astype(str))
+    np.save(os.path.join(tmp_dir, BANK_CODES_FILE), banks.codes.astype(np.int32))
+    with open(os.path.join(tmp_dir, BANK_CATEGORIES_FILE), 'w') as f:
+        json.dump(list(banks.categories), f)
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump({'source_digest': digest, 'rows': len(df), 'created': time.time()}, f)
+
+    old_dir = f"{snapshot_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(snapshot_dir):
+        os.replace(snapshot_dir, old_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_snapshot(snapshot_dir, mmap=True):
+    """
+    Loads the snapshot as a DataFrame whose numeric columns are memory mapped
+    (read only) rather than copied into the process.
+    """
+    mmap_mode = 'r' if mmap else None
+    columns = {}
+    with open(os.path.join(snapshot_dir, BANK_CATEGORIES_FILE)) as f:
+        categories = json.load(f)
+    codes = np.load(os.path.join(snapshot_dir, BANK_CODES_FILE), mmap_mode=mmap_mode)
+    columns['bank_name'] = pd.Series(pd.Categorical.from_codes(codes, categories=categories))
+    for col in SNAPSHOT_COLUMNS:
+        columns[col] = pd.Series(np.load(os.path.join(snapshot_dir, f"{col}.npy"), mmap_mode=mmap_mode), copy=False)
+    return pd.DataFrame(columns, copy=False)
@@ -1,13 +1,12 @@
 import os
 import time
 import json
-import requests
 import random
+import argparse
 import datetime
+import requests
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+from downloader import Downloader, make_session
 
 user_agent = "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
 base_url = "https://m.rbi.org.in/scripts/NEFTView.aspx"
@@ -16,79 +15,193 @@ root = "RBI_Data"
 
 os.makedirs(root, exist_ok=True)
 root_path = os.path.join(os.getcwd(),root)
+cookies_path = os.path.join(root, "cookies.json")
 
 min_year = 2016
 current_year = datetime.datetime.now().year
 
-options = Options()
-options.add_argument(user_agent)
-options.headless = False
-
-driver = webdriver.Chrome(options=options)
-driver.get(base_url)
-
-cookies = driver.get_cookies()
-
-with open(os.path.join(root, "cookies.json"), "w+") as cookie_file:
-    json.dump(cookies, cookie_file)
-
-driver.refresh()
-
-for cookie in cookies:
-    driver.add_cookie(cookie)
-
-driver.refresh()
-
-print("Please solve the captcha manually in the browser.")
-time.sleep(15)
-
-for year in range(min_year, current_year + 1):
-
-    os.chdir(root_path)
-    os.makedirs(str(year),exist_ok=True)
-
-    current_path = os.path.join(root_path,str(year))
-    os.chdir(current_path)
-
 
+class SessionRejected(Exception):
+    """The site answered with a captcha / bot check instead of the listing page."""
+
+
+def parse_listing(html, year_path):
+    """Returns (xlsx_link, file_path) for every workbook in a year's listing page."""
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("tbody")
+    if table is None:
+        return []
+
+    jobs = []
+    month = None
+    for tag in table.contents:
+        if isinstance(tag, str):
+            continue
+        b_tag = tag.find("b")
+        link = tag.find("td",nowrap="")
+        if(b_tag):
+            month = b_tag.text.split("-")[0]
+        elif(link and link.find("a") and month):
+            xlsx_link = link.find("a").get("href")
+            file_path = os.path.join(year_path,month.rstrip()+"."+(xlsx_link.split(".")[-1]))
+            jobs.append((xlsx_link, file_path))
+    return jobs
+
+
+def listing_years(html):
+    """The years named in a listing page's month headings ("January-2019" -> 2019)."""
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("tbody")
+    if table is None:
+        return set()
+    years = set()
+    for b_tag in table.find_all("b"):
+        year = b_tag.text.split("-")[-1].strip()
+        if year.isdigit():
+            years.add(int(year))
+    return years
+
+
+def read_cookies():
     try:
-        button = driver.find_element(By.ID, f"btn{year}")
-        button.click()
-        time.sleep(random.uniform(0.5, 1.5))
-
-        all_months = driver.find_element(By.ID, f"{year}0")
-        all_months.click()
-        time.sleep(random.uniform(0.5, 1.5))
-
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        with open(cookies_path) as cookie_file:
+            return json.load(cookie_file)
+    except (OSError, ValueError):
+        return []
 
-        table = soup.find("tbody")
 
-        for tag in table.contents:
-            b_tag = tag.find("b")
-            link = tag.find("td",nowrap="")
-            #print(tag)
-            if(b_tag):
-                month = b_tag.text.split("-")[0]
-            elif(link):
-                xlsx_link = link.find("a").get("href")
-                print(xlsx_link.split("."))
+def save_cookies(cookies):
+    with open(cookies_path, "w+") as cookie_file:
+        json.dump(cookies, cookie_file)
 
-                file_content = requests.get(xlsx_link).content
-                file_path = os.path.join(os.getcwd(),month.rstrip()+"."+(xlsx_link.split(".")[-1]))
-                print(file_path)
 
-                with open(file_path,'wb+') as file:
-                    file.write(file_content)
+def form_fields(html):
+    """The ASP.NET form's input values (__VIEWSTATE, __EVENTVALIDATION, hdnYear, hdnMonth, ...)."""
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.find(id=f"btn{current_year}") is None and soup.find(id=f"btn{current_year - 1}") is None:
+        raise SessionRejected("NEFTView page did not contain the year buttons")
+    return {field.get("name"): field.get("value", "") for field in soup.find_all("input") if field.get("name")}
+
+
+def fetch_listings_http(session, years):
+    """
+    Fetches each year's "all months" listing with plain HTTP, replaying the
+    page's postback (hdnYear / hdnMonth) using the saved cookies. Raises
+    SessionRejected when the cookies no longer get past the bot check, or when
+    the page that comes back lists another year than the one posted (the
+    postback was ignored), so main() falls back to the browser.
+    """
+    response = session.get(base_url, timeout=30)
+    if response.status_code != 200:
+        raise SessionRejected(f"NEFTView returned HTTP {response.status_code}")
+    fields = form_fields(response.text)
+
+    jobs = []
+    for year in years:
+        year_path = os.path.join(root_path,str(year))
+        os.makedirs(year_path,exist_ok=True)
+        data = dict(fields, hdnYear=str(year), hdnMonth="0")
+        response = session.post(base_url, data=data, timeout=30)
+        if response.status_code != 200:
+            raise SessionRejected(f"Listing for {year} returned HTTP {response.status_code}")
+        # Keep the latest view state for the next postback
+        fields = form_fields(response.text)
+        shown_years = listing_years(response.text)
+        if shown_years - {year}:
+            raise SessionRejected(f"Listing for {year} showed {sorted(shown_years)} instead")
+        year_jobs = parse_listing(response.text, year_path)
+        print(f"{year}: {len(year_jobs)} workbooks")
+        jobs.extend(year_jobs)
+    return jobs
+
+
+def fetch_listings_browser(years):
+    """Opens Chrome for the manual captcha, then clicks through each year's listing. Returns (jobs, cookies)."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+
+    options = Options()
+    options.add_argument(user_agent)
+    options.headless = False
+
+    driver = webdriver.Chrome(options=options)
+    driver.get(base_url)
+
+    cookies = driver.get_cookies()
+
+    driver.refresh()
+
+    for cookie in cookies:
+        driver.add_cookie(cookie)
+
+    driver.refresh()
+
+    print("Please solve the captcha manually in the browser.")
+    time.sleep(15)
+
+    jobs = []
+    for year in years:
+
+        year_path = os.path.join(root_path,str(year))
+        os.makedirs(year_path,exist_ok=True)
+
+
+        try:
+            button = driver.find_element(By.ID, f"btn{year}")
+            button.click()
+            time.sleep(random.uniform(0.5, 1.5))
+
+            all_months = driver.find_element(By.ID, f"{year}0")
+            all_months.click()
+            time.sleep(random.uniform(0.5, 1.5))
+
+            jobs.extend(parse_listing(driver.page_source, year_path))
+
+
+        except Exception as e:
+            print(f"Skipping {year} due to error: {str(e)}")
+
+    # Cookies after the captcha, so the next run can skip the browser
+    cookies = driver.get_cookies()
+    driver.quit()
+    return jobs, cookies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the RBI NEFT monthly workbooks.")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent downloads")
+    parser.add_argument("--retries", type=int, default=4, help="retries per download on transient errors")
+    parser.add_argument("--browser", action="store_true", help="always use Chrome instead of the saved cookies")
+    args = parser.parse_args()
+
+    years = range(min_year, current_year + 1)
+    cookies = read_cookies()
+    session = make_session(user_agent.split("=", 1)[1], cookies)
+    jobs = None
+    if cookies and not args.browser:
+        try:
+            jobs = fetch_listings_http(session, years)
+        except (SessionRejected, requests.RequestException) as e:
+            print(f"Saved session rejected ({e}); falling back to the browser.")
+    if jobs is None:
+        jobs, cookies = fetch_listings_browser(years)
+        save_cookies(cookies)
+        session = make_session(user_agent.split("=", 1)[1], cookies)
+
+    # The listing's session (or the browser's cookies) also fetches the files
+    downloader = Downloader(
+        os.path.join(root_path, "downloads.json"), workers=args.workers, max_retries=args.retries,
+        session=session,
+    )
 
-                print("NEXT")
-            else:
-                continue
-        time.sleep(random.uniform(2.5, 3.5))
+    print(f"Downloading {len(jobs)} workbooks with {args.workers} workers...")
+    results = downloader.download_all(jobs)
+    statuses = [status for status, _ in results.values()]
+    print(f"Downloaded {statuses.count('downloaded')}, unchanged {statuses.count('not_modified') + statuses.count('skipped')}, failed {statuses.count('failed')}.")
 
+    print("Download Completed.")
 
-    except Exception as e:
-        print(f"Skipping {year} due to error: {str(e)}")
 
-print("Download Completed.")
-driver.quit()
+if __name__ == "__main__":
+    main()
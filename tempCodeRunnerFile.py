@@ -8,6 +8,9 @@ import base64
 import calendar # Import calendar for month names
 import matplotlib
 from decimal import Decimal # Import Decimal
+from sqlalchemy import text
+import snapshot
+from fileconverter import MetricSchema
 
 # Use Agg backend for matplotlib
 matplotlib.use('Agg')
@@ -16,7 +19,9 @@ user = "root"
 password = "2102005"
 port = 3306
 host = "localhost"
-new_db_name = "rbi_metric_neft"
+# Same METRIC switch as app.py: the payment system's database and tables
+schema = MetricSchema(os.environ.get('METRIC', 'NEFT').upper())
+new_db_name = f"rbi_metric_{schema.metric.lower()}"
 
 app = Flask(__name__)
 # Ensure the instance folder exists if using SQLite default fallback
@@ -48,8 +53,34 @@ def get_month_name(month_num):
 # Register the custom filter with Jinja environment
 app.jinja_env.filters['month_name'] = get_month_name
 
+# Columnar snapshot written by fileconverter.py (memory mapped at startup when fresh)
+snapshot_dir = os.environ.get('NEFT_SNAPSHOT_DIR', os.path.join(os.getcwd(), "RBI_Data", "snapshot", schema.metric.lower()))
+
 # --- Preload Data (Improved Robustness) ---
 with app.app_context():
+    def load_neft_snapshot():
+        """Loads the snapshot if it exists and matches the ingest manifest; otherwise returns None."""
+        meta = snapshot.read_meta(snapshot_dir)
+        if not meta:
+            print(f"No {schema.metric} snapshot found in {snapshot_dir}, loading from the database.")
+            return None
+        try:
+            with db.engine.connect() as connection:
+                manifest_rows = connection.execute(text(f"SELECT `path`, `sha256` FROM `{schema.manifest_table}`")).all()
+            if snapshot.source_digest(manifest_rows) != meta.get('source_digest'):
+                print(f"{schema.metric} snapshot is stale, loading from the database.")
+                return None
+        except Exception as e:
+            # Database unreachable or pre-manifest: the snapshot is the best data we have
+            print(f"Could not check {schema.metric} snapshot against the database, using it anyway: {e}")
+        try:
+            df = snapshot.load_snapshot(snapshot_dir)
+        except Exception as e:
+            print(f"Error loading {schema.metric} snapshot: {e}")
+            return None
+        print(f"Loaded {len(df)} rows from snapshot {snapshot_dir}.")
+        return df
+
     def load_all_neft_data():
         all_data = []
         try: # Wrap the whole loading process in a try block
@@ -59,8 +90,8 @@ with app.app_context():
             print(f"Error connecting to DB or inspecting tables: {e}")
             return pd.DataFrame() # Return empty DataFrame on DB connection error
 
-        neft_tables = [t for t in tables if t.startswith('neft_')]
-        print(f"Found NEFT tables: {neft_tables}") # Debug print
+        neft_tables = [t for t in tables if t.lower().startswith(f"{schema.metric.lower()}_")]
+        print(f"Found {schema.metric} tables: {neft_tables}") # Debug print
 
         month_lookup = {
             'january': 1, 'february': 2, 'march': 3, 'april': 4,
@@ -101,7 +132,7 @@ with app.app_context():
                 continue # Continue processing other tables
 
         if not all_data:
-             print("Warning: No data loaded from NEFT tables.")
+             print(f"Warning: No data loaded from {schema.metric} tables.")
              return pd.DataFrame() # Return empty DataFrame if no data
 
         df = pd.DataFrame(all_data)
@@ -166,7 +197,9 @@ with app.app_context():
         print(f"DataFrame head after cleaning:\n{df.head()}") # Debug print
         return df
 
-    global_df = load_all_neft_data()
+    global_df = load_neft_snapshot()
+    if global_df is None:
+        global_df = load_all_neft_data()
     if global_df.empty:
         print("CRITICAL WARNING: global_df is empty after loading. Check DB connection and table data.")
 
@@ -177,7 +210,7 @@ def home():
     # Ensure global_df exists and is not empty before proceeding
     if 'global_df' not in globals() or global_df.empty:
          # Render a specific error page or a simple message
-         return "Error: NEFT data could not be loaded. Please check the application logs.", 500
+         return f"Error: {schema.metric} data could not be loaded. Please check the application logs.", 500
 
     # Make a copy to avoid modifying the global DataFrame
     df_filtered = global_df.copy()
@@ -257,7 +290,7 @@ def graph1():
 
         fig, ax = plt.subplots(figsize=(10,6))
         ax.plot(df_grouped['Month_Year'], df_grouped['total_transactions'], marker='o')
-        ax.set_title('Monthly NEFT Volume Trend (All Banks Combined)')
+        ax.set_title(f'Monthly {schema.metric} Volume Trend (All Banks Combined)')
         ax.set_xlabel('Month-Year')
         ax.set_ylabel('Total # of Transactions')
         ax.grid(True)
@@ -284,7 +317,7 @@ def graph2():
         fig, ax = plt.subplots(figsize=(10,6))
         ax.fill_between(df_grouped['Month_Year'], df_grouped['total_amount'], alpha=0.5)
         ax.plot(df_grouped['Month_Year'], df_grouped['total_amount'], marker='o')
-        ax.set_title('Monthly NEFT Value Trend (All Banks Combined)')
+        ax.set_title(f'Monthly {schema.metric} Value Trend (All Banks Combined)')
         ax.set_xlabel('Month-Year')
         ax.set_ylabel('Total Amount')
         ax.grid(True)
@@ -342,7 +375,7 @@ def graph4():
 
         fig, ax = plt.subplots(figsize=(10,6))
         ax.bar(df_top10['bank_name'], df_top10['total_amount'], color='orange')
-        ax.set_title('Top 10 Banks by Total NEFT Amount')
+        ax.set_title(f'Top 10 Banks by Total {schema.metric} Amount')
         ax.set_ylabel('Total Amount')
         ax.ticklabel_format(style='plain', axis='y') # Prevent scientific notation
         plt.xticks(rotation=45, ha='right') # Correct way to rotate xticks with matplotlib Axes object
@@ -359,7 +392,7 @@ if __name__ == '__main__':
     # Add check after loading data
     if 'global_df' not in globals() or global_df.empty:
        print("*"*20)
-       print("WARNING: No NEFT data was loaded. The application might not function correctly.")
+       print(f"WARNING: No {schema.metric} data was loaded. The application might not function correctly.")
        print("*"*20)
     # Consider adding db.create_all() if models were defined and needed tables
     # with app.app_context():
@@ -0,0 +1,109 @@
+"""
+Downloader against a local http.server on an ephemeral port: retries on 503,
+conditional GETs answered with 304, and .part files on truncated bodies.
+
+    python -m unittest test_downloader
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import downloader
+from downloader import Downloader
+
+BODY = b"workbook bytes " * 1000
+ETAG = '"v1"'
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers each GET with the next status in server.script (200 once it runs out)."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        status = self.server.script.pop(0) if self.server.script else 200
+        if status == 200 and self.headers.get('If-None-Match') == ETAG:
+            status = 304
+        if status == 'truncated':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY[:100])
+            self.close_connection = True
+            return
+        self.send_response(status)
+        if status == 200:
+            self.send_header('Content-Length', str(len(BODY)))
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            self.wfile.write(BODY)
+        else:
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptedHandler)
+        self.server.script, self.server.requests = [], []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/January.xlsx"
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.work_dir.name, "2024", "January.xlsx")
+        self.state_path = os.path.join(self.work_dir.name, "downloads.json")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.work_dir.cleanup()
+
+    def make_downloader(self):
+        return Downloader(self.state_path, workers=1, max_retries=2, backoff=0, timeout=5)
+
+    def test_retries_then_downloads(self):
+        self.server.script = [503, 200]
+        status, size = self.make_downloader().fetch(self.url, self.path)
+        self.assertEqual((status, size), ('downloaded', len(BODY)))
+        self.assertEqual(len(self.server.requests), 2)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), BODY)
+        self.assertFalse(os.path.exists(f"{self.path}.part"))
+
+    def test_revalidates_without_hashing(self):
+        first = self.make_downloader()
+        first.download_all([(self.url, self.path)])
+        entry = first.state[os.path.abspath(self.path)]
+        self.assertEqual(entry['sha256'], hashlib.sha256(BODY).hexdigest())
+
+        # Size and mtime match the saved state, so the file is not read again
+        with mock.patch.object(downloader, 'file_sha256', side_effect=AssertionError("hashed")):
+            status, _ = self.make_downloader().fetch(self.url, self.path)
+        self.assertEqual(status, 'not_modified')
+        self.assertEqual(self.server.requests[-1].get('If-None-Match'), ETAG)
+
+    def test_touched_file_is_hashed_once(self):
+        first = self.make_downloader()
+        first.download_all([(self.url, self.path)])
+        os.utime(self.path, (0, 0))
+        second = self.make_downloader()
+        self.assertEqual(second.fetch(self.url, self.path)[0], 'not_modified')
+        self.assertEqual(second.state[os.path.abspath(self.path)]['mtime'], 0)
+
+    def test_truncated_body_leaves_no_file(self):
+        self.server.script = ['truncated']
+        with self.assertRaises(Exception):
+            Downloader(self.state_path, workers=1, max_retries=0, backoff=0, timeout=5).fetch(self.url, self.path)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(f"{self.path}.part"))
+
+
+if __name__ == "__main__":
+    unittest.main()
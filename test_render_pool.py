@@ -0,0 +1,71 @@
+"""
+RenderPool with real worker processes: a job that hangs past its timeout has its
+workers terminated after the grace period, and the pool recovers its slots.
+
+    python -m unittest test_render_pool
+"""
+
+import time
+import unittest
+
+from render_pool import RenderPool, RenderBusy, RenderTimeout
+
+
+def sleepy_render(spec):
+    """Stand-in for render_spec that sleeps for spec['sleep'] seconds."""
+    time.sleep(spec.get('sleep', 0))
+    return b"image"
+
+
+class SleepyPool(RenderPool):
+    render_function = staticmethod(sleepy_render)
+
+
+class RenderPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = SleepyPool(workers=1, max_pending=1, timeout=30, queue_wait=0.1, hung_grace=0.5)
+        # Start the worker (spawn plus the matplotlib import) before timing anything, so
+        # a sleeping job is running rather than queued when it times out
+        self.pool.render({'sleep': 0})
+        self.pool.timeout = 0.5
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def wait_for_slot(self, deadline):
+        """Renders a quick spec once the slot is free again, or fails after deadline seconds."""
+        self.pool.timeout = 30  # The pool may have to start a fresh worker
+        give_up = time.monotonic() + deadline
+        while True:
+            try:
+                return self.pool.render({'sleep': 0})
+            except RenderBusy:
+                if time.monotonic() > give_up:
+                    self.fail("render slot was never released")
+
+    def test_renders(self):
+        self.assertEqual(self.pool.render({'sleep': 0}), b"image")
+        self.assertEqual(self.pool.get_stats()['rendered'], 2)
+
+    def test_hung_worker_is_replaced(self):
+        with self.assertRaises(RenderTimeout):
+            self.pool.render({'sleep': 60})
+        # The hung job still holds the only slot
+        with self.assertRaises(RenderBusy):
+            self.pool.render({'sleep': 0})
+
+        self.assertEqual(self.wait_for_slot(deadline=10), b"image")
+        stats = self.pool.get_stats()
+        self.assertEqual((stats['timeouts'], stats['hung']), (1, 1))
+
+    def test_slow_job_finishing_in_grace_keeps_pool(self):
+        self.pool.hung_grace = 5
+        with self.assertRaises(RenderTimeout):
+            self.pool.render({'sleep': 1})
+        self.assertEqual(self.wait_for_slot(deadline=3), b"image")
+        self.assertEqual(self.pool.get_stats()['hung'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()